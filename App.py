@@ -8,10 +8,11 @@ class App:
 
 
     @staticmethod
-    def solve_sudoku(sudoku_file, heuristic="default", use_backtracking=False):
+    def solve_sudoku(sudoku_file, heuristic="default", use_backtracking=False, search="plain", rules=None,
+                     ordering="none"):
         game = Game(Sudoku(sudoku_file))
         game.show_sudoku()
-        if game.solve(heuristic, use_backtracking) and game.valid_solution():
+        if game.solve(heuristic, use_backtracking, search, rules, ordering=ordering) and game.valid_solution():
             print("Solved!")
         else:
             print("Could not solve this sudoku :(")
@@ -20,8 +21,18 @@ class App:
     def start():
         while True:
             file_num = input("Enter Sudoku file (1-5): ")
-            heuristic_choice = input("Choose heuristic (default/MRV/Degree/ConstraintPropagation): ").strip().lower()
+            heuristic_choice = input("Choose heuristic (default/MRV/Degree/ConstraintPropagation/DLX/auto): ").strip().lower()
+            # Map the lowercased answer back to the name Game.solve expects
+            heuristic_choice = {name.lower(): name for name in Game.HEURISTICS + ("auto",)}.get(heuristic_choice,
+                                                                                                 "default")
             use_backtracking = input("Use backtracking? (yes/no): ").strip().lower() == "yes"
+            search = "plain"
+            ordering = "none"
+            if use_backtracking:
+                search = input("Search mode (plain/forward_checking/mac): ").strip().lower().replace(" ", "_")
+                search = search if search in Game.SEARCH_MODES else "plain"
+                ordering = input("Value ordering (none/lcv/cached_lcv): ").strip().lower().replace(" ", "_")
+                ordering = ordering if ordering in Game.VALUE_ORDERINGS else "none"
             choice = input("Do you want to do a complexity study? (yes/no): ").strip().lower()
             print(f"Final use_backtracking value: {use_backtracking}")  # Debug print
             print("\n")
@@ -32,7 +43,8 @@ class App:
                     file = filename
             if file is not None:
                 print(f"Using backtracking: {use_backtracking}")
-                App.solve_sudoku(os.path.join(sudoku_folder, file), heuristic_choice, use_backtracking)
+                App.solve_sudoku(os.path.join(sudoku_folder, file), heuristic_choice, use_backtracking, search,
+                                 ordering=ordering)
             else:
                 print("Invalid choice")
 
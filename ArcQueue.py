@@ -0,0 +1,46 @@
+from collections import deque
+
+
+class ArcQueue:
+    """
+    FIFO worklist of arcs for AC-3. A companion set mirrors the queue contents so that checking
+    whether an arc is already queued takes constant time instead of a scan of the whole deque.
+    """
+
+    def __init__(self, arcs=()):
+        self.queue = deque()
+        self.queued = set()
+        self.extend(arcs)
+
+    def append(self, arc):
+        """
+        Adds an arc to the end of the queue unless it is already waiting in the queue
+        @param arc: (x, y) tuple
+        @return: true if the arc was added
+        """
+        if arc in self.queued:
+            return False
+        self.queued.add(arc)
+        self.queue.append(arc)
+        return True
+
+    def extend(self, arcs):
+        for arc in arcs:
+            self.append(arc)
+
+    def popleft(self):
+        arc = self.queue.popleft()
+        self.queued.discard(arc)
+        return arc
+
+    def __contains__(self, arc):
+        return arc in self.queued
+
+    def __len__(self):
+        return len(self.queue)
+
+    def __bool__(self):
+        return bool(self.queue)
+
+    def __iter__(self):
+        return iter(self.queue)
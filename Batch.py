@@ -0,0 +1,234 @@
+import argparse
+import csv
+import time
+from contextlib import nullcontext
+from itertools import islice
+from Budget import Budget
+from Game import Game
+from GridFile import GridFile
+from Parallel import Parallel
+from Rules import Propagator
+from SolutionCache import SolutionCache
+from SolveStats import SolveStats
+
+
+class Batch:
+    """
+    Solves many puzzles from one file. Puzzles are read lazily and results are written as soon as
+    each puzzle is solved, so memory use does not depend on the number of puzzles in the file.
+    """
+
+    STATS_FIELDS = ["index", "solved", "time", "ac3_iterations", "backtrack_iterations", "rules_fired",
+                    "solutions", "unique", "cached"] + SolveStats.FIELDS
+
+    # Supported board sizes, as the length of a row and of a whole board written on one line
+    ROW_LENGTHS = (9, 16, 25)
+    BOARD_LENGTHS = (81, 256, 625)
+
+    @staticmethod
+    def read_puzzles(filename):
+        """
+        Stream puzzles from a file. Two layouts are accepted and may be mixed: one puzzle per line
+        (81 characters for a 9x9 board, 256 or 625 for 16x16 and 25x25), or one row per line like the
+        files in Sudokus/, where a row is either one character per field or whitespace separated numbers.
+        Empty lines and lines starting with # are skipped. Binary files written by GridFile are read as well.
+        @param filename: Puzzle file
+        @return: Generator of puzzles in a format Sudoku.from_string reads, with 0 for empty fields
+        """
+        if GridFile.is_grid_file(filename):
+            with GridFile(filename) as grids:
+                yield from grids.lines()
+            return
+        rows = []
+        with open(filename, "r") as file:
+            for line_number, line in enumerate(file, start=1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                line = line.replace(".", "0")
+                tokens = line.split()
+                if len(tokens) > 1:
+                    rows.append(line)
+                    if len(rows) == len(tokens):
+                        yield "\n".join(rows)
+                        rows = []
+                elif len(line) in Batch.BOARD_LENGTHS and not rows:
+                    yield line
+                elif len(line) in Batch.ROW_LENGTHS:
+                    rows.append(line)
+                    if len(rows) == len(line):
+                        yield "".join(rows)
+                        rows = []
+                else:
+                    raise ValueError(f"{filename}:{line_number}: expected a row or a whole puzzle, got {len(line)} fields")
+        if rows:
+            raise ValueError(f"{filename}: incomplete puzzle at the end of the file")
+
+    @staticmethod
+    def solve_puzzle(puzzle, heuristic="default", use_backtracking=True, search="plain", rules=None, cache=None,
+                     ordering="none", limits=None):
+        """
+        Solve a single puzzle given in one of the formats produced by read_puzzles
+        @param rules: names of the inference rules to run with AC-3, see Game.solve
+        @param cache: (capacity, SQLite file or None) of the solution cache of this process, None solves without cache
+        @param ordering: value ordering of the search, one of Game.VALUE_ORDERINGS
+        @param limits: (max_nodes, time_limit) of the search, see Budget, None searches without limits
+        @return: Tuple of the resulting board on a single line and a dict of stats
+        """
+        start_time = time.perf_counter()
+        game = Game.from_string(puzzle, quiet=True)
+        budget = Budget.from_limits(limits)
+        if cache is None:
+            solved = bool(game.solve(heuristic, use_backtracking, search, rules, ordering=ordering,
+                                     budget=budget)) and game.valid_solution()
+            cached = False
+        else:
+            solution_cache = SolutionCache.shared(*cache)
+            hits = solution_cache.hits + solution_cache.disk_hits
+            solved = bool(solution_cache.solve(game, heuristic, use_backtracking, search, rules,
+                                               ordering, budget)) and game.valid_solution()
+            cached = solution_cache.hits + solution_cache.disk_hits > hits
+        stats = {
+            "solved": solved,
+            "time": time.perf_counter() - start_time,
+            "ac3_iterations": game.ac3_iterations,
+            "backtrack_iterations": game.backtrack_iterations,
+            "rules_fired": game.propagator.total_hits() if game.propagator and not cached else 0,
+            "cached": cached,
+            **game.stats.as_dict()
+        }
+        return game.sudoku.to_line(), stats
+
+    @staticmethod
+    def count_puzzle(puzzle, limit=2, heuristic="default", search="mac", rules=None, ordering="none", limits=None):
+        """
+        Count the solutions of a single puzzle up to a limit, see Game.count_solutions
+        @param ordering: value ordering of the search, one of Game.VALUE_ORDERINGS
+        @param limits: (max_nodes, time_limit) of the search, see Budget
+        @return: Tuple of the first solution (or the unsolved board) on a single line and a dict of stats
+        """
+        game = Game.from_string(puzzle, quiet=True)
+        result = game.count_solutions(limit, heuristic, search, rules, ordering, Budget.from_limits(limits))
+        stats = {
+            "status": result["status"],
+            "solved": result["count"] > 0,
+            "time": result["time"],
+            "ac3_iterations": result["ac3_iterations"],
+            "backtrack_iterations": result["backtrack_iterations"],
+            "rules_fired": game.propagator.total_hits() if game.propagator else 0,
+            "solutions": result["count"],
+            "unique": result["unique"]
+        }
+        line = result["solutions"][0] if result["solutions"] else game.sudoku.to_line()
+        return line, stats
+
+    @staticmethod
+    def solve_batch(input_file, output_file, stats_file=None, heuristic="default", use_backtracking=True,
+                    workers=1, chunksize=64, search="plain", vectorized=False, rules=None, count_limit=None,
+                    cache=None, ordering="none", limits=None):
+        """
+        Solve every puzzle in a file, writing one result line per puzzle to the output file and
+        optionally one CSV row of stats per puzzle to the stats file.
+        @param workers: number of worker processes, results are still written in input order
+        @param chunksize: number of puzzles sent to a worker at once
+        @param vectorized: propagate each chunk of puzzles together with NumPy before searching the leftovers
+        @param rules: names of the inference rules to run with AC-3, see Game.solve
+        @param count_limit: count the solutions of every puzzle up to this limit instead of stopping at the first,
+        2 checks that every puzzle has a unique solution
+        @param cache: (capacity, SQLite file or None) of a solution cache in front of the solver, every worker
+        process keeps its own memory tier and they share the file
+        @param ordering: value ordering of the search, one of Game.VALUE_ORDERINGS
+        @param limits: (max_nodes, time_limit) of the search of every puzzle, see Budget. Puzzles that run out of
+        it get the status budget_exceeded in the stats file
+        @return: Tuple of (number of puzzles, number solved)
+        """
+        total = 0
+        solved = 0
+        stats_context = open(stats_file, "w", newline="") if stats_file else nullcontext()
+        with open(output_file, "w") as output, stats_context as stats_output:
+            stats_writer = None
+            if stats_output is not None:
+                stats_writer = csv.DictWriter(stats_output, fieldnames=Batch.STATS_FIELDS)
+                stats_writer.writeheader()
+            puzzles = Batch.read_puzzles(input_file)
+            if count_limit:
+                results = Parallel.ordered_map(Batch.count_puzzle, puzzles, workers, chunksize,
+                                               (count_limit, heuristic, search, rules, ordering, limits))
+            elif vectorized:
+                results = Batch.solve_vectorized(puzzles, heuristic, use_backtracking, workers, chunksize, search,
+                                                 rules, ordering, limits)
+            else:
+                results = Parallel.ordered_map(Batch.solve_puzzle, puzzles, workers, chunksize,
+                                               (heuristic, use_backtracking, search, rules, cache, ordering, limits))
+            for index, (solution, stats) in enumerate(results):
+                output.write(solution + "\n")
+                if stats_writer is not None:
+                    stats_writer.writerow({"index": index, **stats})
+                total += 1
+                solved += stats["solved"]
+        return total, solved
+
+    @staticmethod
+    def solve_vectorized(puzzles, heuristic, use_backtracking, workers, chunksize, search, rules=None, ordering="none",
+                         limits=None):
+        """
+        Solve puzzles in blocks of chunksize with BatchPropagation, spreading the blocks over the workers
+        @return: Generator of (resulting board, dict of stats) in input order
+        """
+        # Imported here so that only vectorized runs load NumPy
+        from BatchPropagation import BatchPropagation
+        blocks = Batch.blocks(puzzles, chunksize)
+        for block_results in Parallel.ordered_map(BatchPropagation.solve_block, blocks, workers, 1,
+                                                  (heuristic, use_backtracking, search, rules, ordering, limits)):
+            yield from block_results
+
+    @staticmethod
+    def blocks(items, size):
+        """Lazily group an iterable into lists of at most size items"""
+        items = iter(items)
+        while True:
+            block = list(islice(items, size))
+            if not block:
+                return
+            yield block
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve all sudokus in a file")
+    parser.add_argument("input", help="puzzle file, one puzzle per line or one row per line")
+    parser.add_argument("output", help="file to write the solved boards to")
+    parser.add_argument("--stats", help="CSV file to write per-puzzle stats to")
+    parser.add_argument("--heuristic", default="default", choices=Game.HEURISTICS + ("auto",))
+    parser.add_argument("--no-backtracking", action="store_true")
+    parser.add_argument("--search", default="plain", choices=Game.SEARCH_MODES)
+    parser.add_argument("--ordering", default="none", choices=Game.VALUE_ORDERINGS,
+                        help="order in which the search tries values")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes, 0 uses all cores")
+    parser.add_argument("--chunksize", type=int, default=64)
+    parser.add_argument("--vectorized", action="store_true", help="propagate chunks of puzzles together with NumPy")
+    parser.add_argument("--count", type=int, metavar="LIMIT",
+                        help="count the solutions of every puzzle up to LIMIT, 2 checks uniqueness")
+    parser.add_argument("--cache", type=int, metavar="SIZE",
+                        help="cache up to SIZE solutions, also finding puzzles equivalent under the sudoku symmetries")
+    parser.add_argument("--cache-file", help="SQLite file that keeps the cached solutions between runs")
+    parser.add_argument("--rules", nargs="+", choices=Propagator.RULE_NAMES,
+                        help="inference rules to run with AC-3, e.g. HiddenSingles NakedPairs")
+    parser.add_argument("--max-nodes", type=int, help="give up on a puzzle after this many search nodes")
+    parser.add_argument("--time-limit", type=float, help="give up on a puzzle after this many seconds")
+    args = parser.parse_args()
+
+    limits = None
+    if args.max_nodes is not None or args.time_limit is not None:
+        limits = (args.max_nodes, args.time_limit)
+    if args.vectorized and (args.cache or args.cache_file):
+        parser.error("--cache and --cache-file cannot be combined with --vectorized")
+    cache = None
+    if args.cache or args.cache_file:
+        cache = (args.cache or 10000, args.cache_file)
+    total, solved = Batch.solve_batch(args.input, args.output, args.stats, args.heuristic,
+                                      not args.no_backtracking, args.workers, args.chunksize, args.search,
+                                      args.vectorized, args.rules, args.count, cache, args.ordering,
+                                      limits)
+    print(f"Solved {solved} of {total} sudokus")
+    if cache is not None and args.workers == 1:
+        print("Cache: " + ", ".join(f"{name} {value}" for name, value in SolutionCache.shared(*cache).stats().items()))
@@ -0,0 +1,168 @@
+import time
+import numpy as np
+from Batch import Batch
+from Budget import Budget
+from Domain import SYMBOLS, full_mask
+from Game import Game
+from SolveStats import SolveStats
+from Sudoku import Sudoku
+from Topology import Topology
+
+
+class BatchPropagation:
+    """
+    Constraint propagation for many puzzles at once. A batch of N puzzles is held as an (N, cells)
+    array of domain bitmasks and naked singles are eliminated from all peers of all puzzles in one
+    vectorised step, using the static peer table of the board size. Puzzles that are not solved by
+    propagation alone are handed to the regular Game search.
+    """
+
+    # Engines per single line puzzle length, they only depend on the board size
+    _engines = {}
+
+    def __init__(self, box_size=3):
+        self.topology = Topology.for_box_size(box_size)
+        self.size = self.topology.size
+        self.cells = self.topology.cell_count
+        self.full = full_mask(self.size)
+        # (cells, peers per cell) table of peer indices, every field has the same number of peers
+        self.peers = np.array(self.topology.peers, dtype=np.intp)
+        # Value of each character of the single line format, -1 for characters that are not allowed
+        self.char_values = np.full(256, -1, dtype=np.int64)
+        for value, symbol in enumerate(SYMBOLS[:self.size + 1]):
+            self.char_values[ord(symbol)] = value
+            self.char_values[ord(symbol.lower())] = value
+        self.char_values[ord(".")] = 0
+
+    def encode(self, puzzles):
+        """
+        @param puzzles: list of puzzles in the single line format, all of this board size
+        @return: (N, cells) uint32 array of domain masks, a full domain for every empty field
+        """
+        text = "".join(puzzles).encode("ascii")
+        values = self.char_values[np.frombuffer(text, dtype=np.uint8)].reshape(len(puzzles), self.cells)
+        if (values < 0).any():
+            raise ValueError("Invalid character in puzzle")
+        given_bits = np.left_shift(np.uint32(1), np.maximum(values - 1, 0).astype(np.uint32))
+        return np.where(values > 0, given_bits, np.uint32(self.full)).astype(np.uint32)
+
+    def propagate(self, masks):
+        """
+        Removes the value of every singleton field from the domains of its peers until nothing changes
+        @param masks: (N, cells) uint32 array of domain masks, updated in place
+        @return: The same array
+        """
+        active = np.arange(len(masks))
+        while len(active):
+            current = masks[active]
+            # Empty domains also pass this test, they contribute no bits and are reported as contradictions
+            singles = (current & (current - np.uint32(1))) == 0
+            placed = np.where(singles, current, np.uint32(0))
+            eliminated = np.bitwise_or.reduce(placed[:, self.peers], axis=2)
+            reduced = current & ~eliminated
+            changed = (reduced != current).any(axis=1)
+            masks[active] = reduced
+            active = active[changed]
+        return masks
+
+    def decode(self, masks):
+        """
+        @param masks: (N, cells) uint32 array of domain masks
+        @return: List of single line puzzles with the values of all singleton fields, 0 for the other fields
+        """
+        singles = (masks != 0) & ((masks & (masks - np.uint32(1))) == 0)
+        # For a power of two 2^k, frexp returns the exponent k + 1, which is exactly the value
+        values = np.where(singles, np.frexp(masks.astype(np.float64))[1], 0)
+        symbols = np.frombuffer(SYMBOLS.encode("ascii"), dtype=np.uint8)
+        return [row.tobytes().decode("ascii") for row in symbols[values]]
+
+    def solve_puzzles(self, puzzles, heuristic="default", use_backtracking=True, search="plain", rules=None,
+                      ordering="none", limits=None):
+        """
+        Solves a list of puzzles of this board size, propagating them together first
+        @return: List of (resulting board on a single line, dict of stats), in the same format as Batch.solve_puzzle
+        """
+        start_time = time.perf_counter()
+        masks = self.propagate(self.encode(puzzles))
+        contradiction = (masks == 0).any(axis=1)
+        solved = ((masks & (masks - np.uint32(1))) == 0).all(axis=1) & ~contradiction
+        lines = self.decode(masks)
+        # The shared propagation time is spread evenly over the puzzles of the batch
+        propagation_time = (time.perf_counter() - start_time) / len(puzzles)
+
+        results = []
+        for index, line in enumerate(lines):
+            # Zeroed SolveStats fields, so rows solved by propagation have the same columns as Batch.solve_puzzle
+            stats = {"solved": False, "time": propagation_time, "ac3_iterations": 0, "backtrack_iterations": 0,
+                     "rules_fired": 0, "cached": False, **SolveStats().as_dict()}
+            if solved[index]:
+                stats["status"] = "solved"
+                stats["solved"] = True
+            elif contradiction[index]:
+                # The masks of a contradiction are wiped, the scalar solver leaves such a puzzle as it was given
+                line = puzzles[index].upper()
+            else:
+                line, stats = self.solve_leftover(line, masks[index], stats, heuristic, use_backtracking, search, rules,
+                                                  ordering, limits)
+            results.append((line.replace("0", "."), stats))
+        return results
+
+    def solve_leftover(self, line, masks, stats, heuristic, use_backtracking, search, rules, ordering="none",
+                       limits=None):
+        """
+        Continues with the scalar solver on a puzzle that propagation did not finish, starting
+        from the reduced domains
+        @param ordering: value ordering of the search, one of Game.VALUE_ORDERINGS
+        @param limits: (max_nodes, time_limit) of the search, see Budget
+        """
+        start_time = time.perf_counter()
+        game = Game(Sudoku.from_string(line), quiet=True)
+        for index, value in enumerate(game.values):
+            if value == 0:
+                game.domains[index] = int(masks[index])
+        solve_stats = game.solve(heuristic, use_backtracking, search, rules, ordering=ordering,
+                                 budget=Budget.from_limits(limits))
+        stats.update(solve_stats.as_dict())
+        stats["solved"] = bool(solve_stats) and game.valid_solution()
+        stats["time"] += time.perf_counter() - start_time
+        stats["ac3_iterations"] = game.ac3_iterations
+        stats["backtrack_iterations"] = game.backtrack_iterations
+        stats["rules_fired"] = game.propagator.total_hits() if game.propagator else 0
+        return game.sudoku.to_line(), stats
+
+    @staticmethod
+    def solve_block(puzzles, heuristic="default", use_backtracking=True, search="plain", rules=None, ordering="none",
+                    limits=None):
+        """
+        Solves a block of puzzles as read by Batch.read_puzzles. Puzzles on a single line are grouped
+        by board size and propagated together, puzzles written as rows go through Batch.solve_puzzle.
+        @return: List of (resulting board on a single line, dict of stats) in the order of the puzzles
+        """
+        results = [None] * len(puzzles)
+        groups = {}
+        for index, puzzle in enumerate(puzzles):
+            if "\n" in puzzle:
+                results[index] = Batch.solve_puzzle(puzzle, heuristic, use_backtracking, search, rules,
+                                                    ordering=ordering, limits=limits)
+            else:
+                groups.setdefault(len(puzzle), []).append(index)
+
+        for length, indices in groups.items():
+            engine = BatchPropagation.for_length(length)
+            group_results = engine.solve_puzzles([puzzles[index] for index in indices], heuristic,
+                                                 use_backtracking, search, rules, ordering, limits)
+            for index, result in zip(indices, group_results):
+                results[index] = result
+        return results
+
+    @staticmethod
+    def for_length(length):
+        """
+        Shared engine for puzzles of the given single line length, e.g. 81 for 9x9
+        """
+        engine = BatchPropagation._engines.get(length)
+        if engine is None:
+            box_size = round(length ** 0.25)
+            assert box_size ** 4 == length, f"{length} fields is not a valid board"
+            engine = BatchPropagation._engines[length] = BatchPropagation(box_size)
+        return engine
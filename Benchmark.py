@@ -0,0 +1,270 @@
+import argparse
+import csv
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import traceback
+from Batch import Batch
+from Game import Game
+from Sudoku import Sudoku
+
+package_folder = os.path.dirname(os.path.abspath(__file__))
+corpus_folder = os.path.join(package_folder, "Sudokus", "corpus")
+
+
+class Benchmark:
+    """
+    Repeatable timing of the solver configurations on the graded puzzle corpus in Sudokus/corpus.
+    Every configuration is warmed up and then timed several times per puzzle with perf_counter_ns.
+    Results are summarised as percentiles per configuration and difficulty tier, can be written as
+    JSON or CSV, and can be compared against a stored baseline to detect regressions. The median of
+    every single puzzle can be written as well, which is what CostModel is trained on.
+    """
+
+    TIERS = ["easy", "medium", "hard"]
+    # Plain backtracking is left out by default, it takes minutes on the hard tier
+    SEARCH_MODES = ["forward_checking", "mac"]
+    # DLX ignores the search mode, so it is measured once under this name instead of once per mode
+    DLX_SEARCH = "-"
+    SUMMARY_FIELDS = ["heuristic", "search", "tier", "puzzles", "runs", "solved", "errors",
+                      "median_us", "p90_us", "p99_us", "min_us", "mean_us", "median_nodes"]
+    SAMPLE_FIELDS = ["puzzle", "tier", "heuristic", "search", "solved", "median_us", "nodes"]
+
+    # Modules a process that only solves must be able to import cheaply
+    SOLVER_MODULES = ["Game", "Batch", "Parallel"]
+    # Libraries that are only needed for reports and must never be loaded by the solver modules
+    HEAVY_MODULES = ["pandas", "matplotlib", "numpy"]
+    IMPORT_BUDGET_MS = 100
+
+    def __init__(self, heuristics=Game.HEURISTICS, search_modes=None, tiers=None, warmup=1, repeats=5):
+        self.heuristics = list(heuristics)
+        self.search_modes = list(search_modes or Benchmark.SEARCH_MODES)
+        self.tiers = list(tiers or Benchmark.TIERS)
+        self.warmup = warmup
+        self.repeats = repeats
+        self.results = []
+        # One row per puzzle and configuration, see SAMPLE_FIELDS
+        self.samples = []
+
+    @staticmethod
+    def load_corpus(tiers):
+        """
+        @param tiers: names of the corpus files, without extension
+        @return: Dict of tier name to the list of its puzzles
+        """
+        return {tier: list(Batch.read_puzzles(os.path.join(corpus_folder, tier + ".txt"))) for tier in tiers}
+
+    @staticmethod
+    def time_solve(puzzle, heuristic, search):
+        """
+        Times a single solve. Building the board is not part of the measured time.
+        @return: Tuple of (elapsed ns, solved and valid, backtracking nodes)
+        """
+        game = Game(Sudoku.from_string(puzzle), quiet=True)
+        start = time.perf_counter_ns()
+        solved = game.solve(heuristic, True, search)
+        elapsed = time.perf_counter_ns() - start
+        return elapsed, bool(solved) and game.valid_solution(), game.backtrack_iterations
+
+    @staticmethod
+    def percentile(sorted_values, fraction):
+        """
+        Percentile with linear interpolation between the closest ranks
+        @param sorted_values: non-empty list in increasing order
+        @param fraction: 0.5 for the median, 0.9 for p90, ...
+        """
+        position = (len(sorted_values) - 1) * fraction
+        lower = int(position)
+        upper = min(lower + 1, len(sorted_values) - 1)
+        return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+    def run(self):
+        """
+        Runs every configuration on every tier of the corpus
+        @return: List of summary rows, one per (heuristic, search mode, tier), DLX has one row per tier
+        """
+        corpus = Benchmark.load_corpus(self.tiers)
+        self.results = []
+        self.samples = []
+        for heuristic in self.heuristics:
+            search_modes = [Benchmark.DLX_SEARCH] if heuristic == "DLX" else self.search_modes
+            for search in search_modes:
+                for tier in self.tiers:
+                    self.results.append(self.run_configuration(heuristic, search, tier, corpus[tier]))
+        return self.results
+
+    def run_configuration(self, heuristic, search, tier, puzzles):
+        samples = []
+        nodes = []
+        solved = 0
+        errors = 0
+        for puzzle in puzzles:
+            try:
+                for _ in range(self.warmup):
+                    Benchmark.time_solve(puzzle, heuristic, search)
+                puzzle_samples = []
+                for _ in range(self.repeats):
+                    elapsed, valid, puzzle_nodes = Benchmark.time_solve(puzzle, heuristic, search)
+                    puzzle_samples.append(elapsed)
+                samples.extend(puzzle_samples)
+                solved += valid
+                nodes.append(puzzle_nodes)
+                self.samples.append({
+                    "puzzle": puzzle.replace("\n", ""), "tier": tier, "heuristic": heuristic, "search": search,
+                    "solved": valid, "median_us": Benchmark.percentile(sorted(puzzle_samples), 0.5) / 1000,
+                    "nodes": puzzle_nodes
+                })
+            except Exception:
+                errors += 1
+                traceback.print_exc()
+
+        samples.sort()
+        nodes.sort()
+        row = {"heuristic": heuristic, "search": search, "tier": tier, "puzzles": len(puzzles),
+               "runs": len(samples), "solved": solved, "errors": errors}
+        if samples:
+            row.update({
+                "median_us": Benchmark.percentile(samples, 0.5) / 1000,
+                "p90_us": Benchmark.percentile(samples, 0.9) / 1000,
+                "p99_us": Benchmark.percentile(samples, 0.99) / 1000,
+                "min_us": samples[0] / 1000,
+                "mean_us": sum(samples) / len(samples) / 1000,
+                "median_nodes": Benchmark.percentile(nodes, 0.5)
+            })
+        return row
+
+    def print_summary(self):
+        print(f"{'heuristic':<22}{'search':<18}{'tier':<8}{'solved':>8}{'median us':>12}{'p90 us':>12}{'p99 us':>12}")
+        for row in self.results:
+            print(f"{row['heuristic']:<22}{row['search']:<18}{row['tier']:<8}"
+                  f"{row['solved']:>5}/{row['puzzles']:<2}{row.get('median_us', 0):>12.1f}"
+                  f"{row.get('p90_us', 0):>12.1f}{row.get('p99_us', 0):>12.1f}")
+
+    def write_json(self, filename):
+        metadata = {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "warmup": self.warmup,
+            "repeats": self.repeats
+        }
+        with open(filename, "w") as file:
+            json.dump({"metadata": metadata, "results": self.results}, file, indent=2)
+
+    def write_csv(self, filename):
+        with open(filename, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=Benchmark.SUMMARY_FIELDS)
+            writer.writeheader()
+            writer.writerows(self.results)
+
+    def write_samples(self, filename):
+        """Writes the median time of every puzzle and configuration, the input of CostModel.train"""
+        with open(filename, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=Benchmark.SAMPLE_FIELDS)
+            writer.writeheader()
+            writer.writerows(self.samples)
+
+    def compare(self, baseline_file, tolerance=0.25):
+        """
+        Compares the results against a baseline written by write_json
+        @param baseline_file: JSON file of an earlier run
+        @param tolerance: allowed relative increase of the median time, 0.25 allows 25% slower
+        @return: List of regression messages, empty if there are none
+        """
+        with open(baseline_file) as file:
+            baseline = {(row["heuristic"], row["search"], row["tier"]): row for row in json.load(file)["results"]}
+
+        regressions = []
+        for row in self.results:
+            key = (row["heuristic"], row["search"], row["tier"])
+            base = baseline.get(key)
+            if base is None:
+                continue
+            name = "/".join(key)
+            if row["solved"] < base["solved"] or row["errors"] > base["errors"]:
+                regressions.append(f"{name}: solved {row['solved']} (baseline {base['solved']}), "
+                                   f"errors {row['errors']} (baseline {base['errors']})")
+            if "median_us" in row and "median_us" in base and row["median_us"] > base["median_us"] * (1 + tolerance):
+                regressions.append(f"{name}: median {row['median_us']:.1f} us, baseline {base['median_us']:.1f} us")
+        return regressions
+
+    @staticmethod
+    def measure_import(module):
+        """
+        Imports a module in a fresh interpreter and measures it with -X importtime
+        @param module: name of the module to import
+        @return: Tuple of (cumulative import time in ms, list of heavy modules that got loaded)
+        """
+        code = (f"import sys, {module}\n"
+                f"print(','.join(m for m in {Benchmark.HEAVY_MODULES!r} if m in sys.modules))")
+        completed = subprocess.run([sys.executable, "-X", "importtime", "-c", code], cwd=package_folder,
+                                   capture_output=True, text=True, check=True)
+
+        cumulative_us = 0
+        for line in completed.stderr.splitlines():
+            # Lines look like "import time:       self [us] |  cumulative | imported package"
+            parts = line.split("|")
+            if len(parts) == 3 and parts[2].strip() == module:
+                cumulative_us = int(parts[1])
+        loaded = [name for name in completed.stdout.strip().split(",") if name]
+        return cumulative_us / 1000, loaded
+
+    @staticmethod
+    def check_import_budget(budget_ms=IMPORT_BUDGET_MS):
+        """
+        Checks that none of the solver modules load the heavy libraries and that each imports within the budget
+        @param budget_ms: maximum cumulative import time of a module in milliseconds
+        @return: List of failure messages, empty if every module is within budget
+        """
+        failures = []
+        for module in Benchmark.SOLVER_MODULES:
+            import_ms, loaded = Benchmark.measure_import(module)
+            print(f"import {module}: {import_ms:.1f} ms")
+            if loaded:
+                failures.append(f"import {module} loads {', '.join(loaded)}")
+            if import_ms > budget_ms:
+                failures.append(f"import {module} takes {import_ms:.1f} ms, budget is {budget_ms} ms")
+        return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solver benchmarks")
+    parser.add_argument("--check-imports", action="store_true",
+                        help="only check that the solver modules do not load reporting libraries or import too slowly")
+    parser.add_argument("--import-budget", type=float, default=Benchmark.IMPORT_BUDGET_MS,
+                        help="import time budget per module in ms")
+    parser.add_argument("--heuristics", nargs="+", default=list(Game.HEURISTICS), choices=Game.HEURISTICS + ("auto",))
+    parser.add_argument("--search", nargs="+", default=Benchmark.SEARCH_MODES, choices=Game.SEARCH_MODES)
+    parser.add_argument("--tiers", nargs="+", default=Benchmark.TIERS)
+    parser.add_argument("--warmup", type=int, default=1, help="untimed runs per puzzle")
+    parser.add_argument("--repeats", type=int, default=5, help="timed runs per puzzle")
+    parser.add_argument("--json", help="write the results to this JSON file")
+    parser.add_argument("--csv", help="write the results to this CSV file")
+    parser.add_argument("--samples", help="write the median time of every puzzle to this CSV file, "
+                                          "to retrain the cost model of the auto heuristic")
+    parser.add_argument("--baseline", help="JSON results to compare against, exits with 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown of the median")
+    args = parser.parse_args()
+
+    if args.check_imports:
+        failures = Benchmark.check_import_budget(args.import_budget)
+        for failure in failures:
+            print("FAIL: " + failure)
+        sys.exit(1 if failures else 0)
+
+    benchmark = Benchmark(args.heuristics, args.search, args.tiers, args.warmup, args.repeats)
+    benchmark.run()
+    benchmark.print_summary()
+    if args.json:
+        benchmark.write_json(args.json)
+    if args.csv:
+        benchmark.write_csv(args.csv)
+    if args.samples:
+        benchmark.write_samples(args.samples)
+    if args.baseline:
+        regressions = benchmark.compare(args.baseline, args.tolerance)
+        for regression in regressions:
+            print("REGRESSION: " + regression)
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,73 @@
+import threading
+import time
+
+
+class Budget:
+    """
+    Limits of one solve, checked by the search loops at every node. The node count and the depth are
+    compared on every check, the clock and the cancel event only every CHECK_INTERVAL checks, so a
+    budget costs next to nothing per node. A search that runs out of budget stops with its counters
+    as they are and the reason is kept in reason.
+    """
+
+    # Number of checks between two reads of the clock and the cancel event
+    CHECK_INTERVAL = 64
+    # Reasons a search stopped early
+    REASONS = ("nodes", "depth", "time", "cancelled")
+
+    def __init__(self, max_nodes=None, time_limit=None, max_depth=None, cancel=None):
+        """
+        @param max_nodes: number of search nodes after which the search stops, None for no limit
+        @param time_limit: seconds from the start of the solve after which the search stops, None for no limit
+        @param max_depth: depth of the search stack that may not be exceeded, None for no limit
+        @param cancel: event with is_set(), e.g. a threading.Event or a multiprocessing Event, that stops the
+        search from another thread or process when it is set. None creates a threading.Event, see cancel()
+        """
+        self.max_nodes = max_nodes
+        self.time_limit = time_limit
+        self.max_depth = max_depth
+        self.cancel_event = cancel if cancel is not None else threading.Event()
+        self.deadline = None
+        self.countdown = Budget.CHECK_INTERVAL
+        self.reason = None
+
+    @staticmethod
+    def from_limits(limits):
+        """
+        @param limits: (max_nodes, time_limit) as passed to worker processes, which cannot receive an event
+        @return: A new Budget, None when limits is None
+        """
+        return Budget(*limits) if limits is not None else None
+
+    def start(self):
+        """Starts the clock of the time limit and clears the reason of a previous solve"""
+        self.deadline = time.perf_counter() + self.time_limit if self.time_limit is not None else None
+        self.countdown = Budget.CHECK_INTERVAL
+        self.reason = None
+
+    def cancel(self):
+        """Asks the search to stop at its next check, safe to call from any thread"""
+        self.cancel_event.set()
+
+    def exceeded(self, nodes, depth) -> bool:
+        """
+        @param nodes: search nodes visited so far
+        @param depth: current depth of the search stack
+        @return: true if the search has to stop, the reason is in self.reason
+        """
+        if self.max_nodes is not None and nodes >= self.max_nodes:
+            self.reason = "nodes"
+        elif self.max_depth is not None and depth > self.max_depth:
+            self.reason = "depth"
+        else:
+            self.countdown -= 1
+            if self.countdown:
+                return False
+            self.countdown = Budget.CHECK_INTERVAL
+            if self.cancel_event.is_set():
+                self.reason = "cancelled"
+            elif self.deadline is not None and time.perf_counter() >= self.deadline:
+                self.reason = "time"
+            else:
+                return False
+        return True
@@ -0,0 +1,228 @@
+import argparse
+import csv
+import json
+import math
+import os
+
+package_folder = os.path.dirname(os.path.abspath(__file__))
+
+
+class CostModel:
+    """
+    Chooses the solver configuration for the auto heuristic of Game.solve. A puzzle is described by a few
+    features that cost one pass over the board: the share of givens, how evenly they are spread over the
+    units, and the share of empty fields with 1, 2, 3 or more candidates left by the givens. The cost of every
+    configuration is predicted as the mean log time of the k training puzzles nearest in standardized feature
+    space, and the configuration with the lowest prediction is chosen.
+
+    The model is trained from the per-puzzle samples of Benchmark (--samples) and stored as JSON. Without a
+    model file the auto heuristic falls back to DEFAULT_CONFIGURATION.
+    """
+
+    FEATURES = ("givens", "min_unit_givens", "max_unit_givens", "singles", "pairs", "triples", "wide",
+                "mean_candidates")
+    DEFAULT_CONFIGURATION = ("default", "mac")
+    DEFAULT_PATH = os.path.join(package_folder, "cost_model.json")
+    # Number of nearest training puzzles a prediction is averaged over
+    NEIGHBOURS = 5
+    # A configuration that did not solve a training puzzle is charged this many times its slowest time
+    UNSOLVED_PENALTY = 10
+
+    # Loaded models by path, so a process reads the model file only once
+    _shared = {}
+
+    def __init__(self, configurations, samples, neighbours=NEIGHBOURS):
+        """
+        @param configurations: list of (heuristic, search) the costs refer to
+        @param samples: list of (feature vector, list of log costs in the order of configurations)
+        @param neighbours: number of nearest training puzzles a prediction is averaged over
+        """
+        self.configurations = [tuple(configuration) for configuration in configurations]
+        self.samples = samples
+        self.neighbours = neighbours
+        count = len(samples)
+        self.mean = [sum(features[i] for features, _ in samples) / count for i in range(len(CostModel.FEATURES))]
+        self.scale = []
+        for i, mean in enumerate(self.mean):
+            variance = sum((features[i] - mean) ** 2 for features, _ in samples) / count
+            self.scale.append(math.sqrt(variance) or 1.0)
+        self.points = [self.standardize(features) for features, _ in samples]
+
+    @staticmethod
+    def features(game):
+        """
+        Features of the board of a game before it is solved, read from the values and the used values per unit
+        @return: List of values in the order of FEATURES
+        """
+        topology = game.topology
+        size = topology.size
+        cell_units = topology.cell_units
+        used = game.used
+        filled = game.filled
+        full = (1 << size) - 1
+        counts = [0, 0, 0, 0]
+        candidates = 0
+        empty = 0
+        for index, value in enumerate(game.values):
+            if value:
+                continue
+            row, column, box = cell_units[index]
+            size_left = (full & ~(used[row] | used[column] | used[box])).bit_count()
+            if size_left:
+                counts[min(size_left, 4) - 1] += 1
+            candidates += size_left
+            empty += 1
+        empty = empty or 1
+        return [
+            (topology.cell_count - empty) / topology.cell_count,
+            min(filled) / size,
+            max(filled) / size,
+            counts[0] / empty,
+            counts[1] / empty,
+            counts[2] / empty,
+            counts[3] / empty,
+            candidates / empty / size
+        ]
+
+    def standardize(self, features):
+        return [(value - mean) / scale for value, mean, scale in zip(features, self.mean, self.scale)]
+
+    def predict(self, features, exclude=None):
+        """
+        @param features: feature vector of a puzzle
+        @param exclude: index of a training sample to leave out, for leave-one-out evaluation
+        @return: Predicted log cost of every configuration
+        """
+        point = self.standardize(features)
+        distances = sorted(
+            (sum((a - b) ** 2 for a, b in zip(point, other)), index)
+            for index, other in enumerate(self.points) if index != exclude
+        )
+        nearest = [self.samples[index][1] for _, index in distances[:self.neighbours]]
+        return [sum(costs[i] for costs in nearest) / len(nearest) for i in range(len(self.configurations))]
+
+    def choose(self, game):
+        """
+        @return: (heuristic, search) predicted to solve the board of the game fastest
+        """
+        costs = self.predict(CostModel.features(game))
+        return self.configurations[min(range(len(costs)), key=costs.__getitem__)]
+
+    @staticmethod
+    def shared(path=None):
+        """
+        The model stored in a file, loaded once per process
+        @param path: JSON file written by save, None for DEFAULT_PATH
+        @return: The model, None if the file does not exist
+        """
+        path = path or CostModel.DEFAULT_PATH
+        if path not in CostModel._shared:
+            CostModel._shared[path] = CostModel.load(path) if os.path.exists(path) else None
+        return CostModel._shared[path]
+
+    @staticmethod
+    def choose_configuration(game, path=None):
+        """
+        @return: (heuristic, search) for the auto heuristic, DEFAULT_CONFIGURATION when there is no model
+        """
+        model = CostModel.shared(path)
+        if model is None:
+            return CostModel.DEFAULT_CONFIGURATION
+        return model.choose(game)
+
+    @staticmethod
+    def load(path):
+        with open(path) as file:
+            data = json.load(file)
+        if data.get("features") != list(CostModel.FEATURES):
+            raise ValueError(f"{path} was trained on other features, retrain it with CostModel.py")
+        samples = [(sample["features"], sample["costs"]) for sample in data["samples"]]
+        return CostModel(data["configurations"], samples, data.get("neighbours", CostModel.NEIGHBOURS))
+
+    def save(self, path):
+        data = {
+            "features": list(CostModel.FEATURES),
+            "configurations": [list(configuration) for configuration in self.configurations],
+            "neighbours": self.neighbours,
+            "samples": [{"features": features, "costs": costs} for features, costs in self.samples]
+        }
+        with open(path, "w") as file:
+            json.dump(data, file, indent=1)
+
+    @staticmethod
+    def train(samples_file, neighbours=NEIGHBOURS):
+        """
+        Fits a model to the per-puzzle samples of Benchmark. Only puzzles measured with every configuration are used.
+        @param samples_file: CSV file written by Benchmark.write_samples
+        @return: The model
+        """
+        # Imported here, Game imports this module when the auto heuristic is used
+        from Game import Game
+        times = {}
+        configurations = []
+        with open(samples_file, newline="") as file:
+            for row in csv.DictReader(file):
+                if row["heuristic"] == "auto":
+                    continue  # Measurements of the model itself
+                # DLX ignores the search mode, samples of older benchmarks measured it once per mode
+                search = "-" if row["heuristic"] == "DLX" else row["search"]
+                configuration = (row["heuristic"], search)
+                if configuration not in configurations:
+                    configurations.append(configuration)
+                solved = row["solved"] == "True"
+                measured = times.setdefault(row["puzzle"], {})
+                if configuration not in measured:
+                    measured[configuration] = float(row["median_us"]) if solved else None
+
+        samples = []
+        for puzzle, measured in times.items():
+            if len(measured) < len(configurations):
+                continue
+            solved_times = [time for time in measured.values() if time is not None]
+            if not solved_times:
+                continue
+            penalty = max(solved_times) * CostModel.UNSOLVED_PENALTY
+            costs = [math.log(measured[configuration] or penalty) for configuration in configurations]
+            samples.append((CostModel.features(Game.from_string(puzzle, quiet=True)), costs))
+        if not samples:
+            raise ValueError(f"{samples_file} has no puzzle that was measured with every configuration")
+        return CostModel(configurations, samples, neighbours)
+
+    def evaluate(self):
+        """
+        Leave-one-out evaluation on the training puzzles
+        @return: Dict of the total time in ms of the chosen configurations, of the best single configuration
+        and of the best configuration per puzzle, and the single configuration that is best overall
+        """
+        chosen = 0.0
+        oracle = 0.0
+        totals = [0.0] * len(self.configurations)
+        for index, (features, costs) in enumerate(self.samples):
+            predicted = self.predict(features, exclude=index)
+            choice = min(range(len(costs)), key=predicted.__getitem__)
+            chosen += math.exp(costs[choice])
+            oracle += math.exp(min(costs))
+            for i, cost in enumerate(costs):
+                totals[i] += math.exp(cost)
+        best = min(range(len(totals)), key=totals.__getitem__)
+        return {
+            "auto_ms": chosen / 1000,
+            "best_single_ms": totals[best] / 1000,
+            "best_single": "/".join(self.configurations[best]),
+            "oracle_ms": oracle / 1000
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Retrain the cost model of the auto heuristic")
+    parser.add_argument("samples", help="CSV file written by python Benchmark.py --samples")
+    parser.add_argument("--output", default=CostModel.DEFAULT_PATH, help="model file to write")
+    parser.add_argument("--neighbours", type=int, default=CostModel.NEIGHBOURS)
+    args = parser.parse_args()
+
+    model = CostModel.train(args.samples, args.neighbours)
+    model.save(args.output)
+    result = model.evaluate()
+    print(f"Trained on {len(model.samples)} puzzles and {len(model.configurations)} configurations")
+    print(f"Leave-one-out total time: auto {result['auto_ms']:.1f} ms, best single configuration "
+          f"{result['best_single']} {result['best_single_ms']:.1f} ms, best per puzzle {result['oracle_ms']:.1f} ms")
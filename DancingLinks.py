@@ -0,0 +1,208 @@
+class DancingLinks:
+    """
+    Exact cover formulation of a sudoku, solved with Knuth's Algorithm X on dancing links.
+
+    Every open constraint is a column: each empty field needs a value, and each unit needs every value
+    it does not contain yet. Every candidate (field, value) is a row covering the column of its field
+    and the (unit, value) columns of its row, column and box. A solution is a set of rows covering
+    every column exactly once. The links are kept in flat lists indexed by node number, node 0 is the
+    root and nodes 1 to the number of columns are the column headers.
+    """
+
+    def __init__(self, topology, values, domains):
+        """
+        @param topology: Topology of the board
+        @param values: row-major list of field values, 0 for empty fields
+        @param domains: row-major list of domain masks, only read for the empty fields
+        """
+        self.topology = topology
+        self.left = [0]
+        self.right = [0]
+        self.up = [0]
+        self.down = [0]
+        self.column = [0]
+        # Number of rows left in each column, indexed by the header node
+        self.sizes = [0]
+        # (field index, value) of every row node, None for the root and the headers
+        self.candidates = [None]
+        self.consistent = True
+        self.nodes = 0
+
+        size = topology.size
+        cells = topology.cell_count
+        cell_units = topology.cell_units
+
+        # Values already placed in every unit, a repeated value means the givens contradict each other
+        placed = [0] * len(topology.units)
+        for index, value in enumerate(values):
+            if value:
+                value_bit = 1 << (value - 1)
+                for unit in cell_units[index]:
+                    if placed[unit] & value_bit:
+                        self.consistent = False
+                    placed[unit] |= value_bit
+
+        # Column keys: the field index for "field has a value", cells + unit * size + value - 1 for "unit has value"
+        headers = {}
+        for index, value in enumerate(values):
+            if value == 0:
+                headers[index] = self.add_header()
+        for unit in range(len(topology.units)):
+            for value in range(size):
+                if not placed[unit] & (1 << value):
+                    headers[cells + unit * size + value] = self.add_header()
+
+        for index, value in enumerate(values):
+            if value:
+                continue
+            units = cell_units[index]
+            mask = domains[index]
+            for unit in units:
+                mask &= ~placed[unit]
+            while mask:
+                value_bit = mask & -mask
+                mask ^= value_bit
+                digit = value_bit.bit_length() - 1
+                self.add_row((index, digit + 1),
+                             [headers[index]] + [headers[cells + unit * size + digit] for unit in units])
+
+    def add_header(self):
+        """Appends a column header to the end of the header list and returns its node"""
+        node = len(self.left)
+        last = self.left[0]
+        self.left.append(last)
+        self.right.append(0)
+        self.right[last] = node
+        self.left[0] = node
+        self.up.append(node)
+        self.down.append(node)
+        self.column.append(node)
+        self.sizes.append(0)
+        self.candidates.append(None)
+        return node
+
+    def add_row(self, candidate, headers):
+        """
+        Appends a row with one node in each of the given columns
+        @param candidate: (field index, value) the row stands for
+        @param headers: header nodes of the columns the row covers
+        """
+        first = len(self.left)
+        count = len(headers)
+        for offset, header in enumerate(headers):
+            node = first + offset
+            self.left.append(first + (offset - 1) % count)
+            self.right.append(first + (offset + 1) % count)
+            last = self.up[header]
+            self.up.append(last)
+            self.down.append(header)
+            self.down[last] = node
+            self.up[header] = node
+            self.column.append(header)
+            self.sizes[header] += 1
+            self.candidates.append(candidate)
+
+    def cover(self, header):
+        """Removes a column and every row that intersects it"""
+        left, right, up, down, column, sizes = self.left, self.right, self.up, self.down, self.column, self.sizes
+        right[left[header]] = right[header]
+        left[right[header]] = left[header]
+        row = down[header]
+        while row != header:
+            node = right[row]
+            while node != row:
+                down[up[node]] = down[node]
+                up[down[node]] = up[node]
+                sizes[column[node]] -= 1
+                node = right[node]
+            row = down[row]
+
+    def uncover(self, header):
+        """Restores a column removed by cover, in exactly the reverse order"""
+        left, right, up, down, column, sizes = self.left, self.right, self.up, self.down, self.column, self.sizes
+        row = up[header]
+        while row != header:
+            node = left[row]
+            while node != row:
+                sizes[column[node]] += 1
+                down[up[node]] = node
+                up[down[node]] = node
+                node = left[node]
+            row = up[row]
+        right[left[header]] = header
+        left[right[header]] = header
+
+    def select(self, row):
+        """Covers the other columns of a row that was chosen for the solution"""
+        node = self.right[row]
+        while node != row:
+            self.cover(self.column[node])
+            node = self.right[node]
+
+    def deselect(self, row):
+        """Reverts select"""
+        node = self.left[row]
+        while node != row:
+            self.uncover(self.column[node])
+            node = self.left[node]
+
+    def choose_column(self):
+        """The column with the fewest rows left, the first one on ties"""
+        right, sizes = self.right, self.sizes
+        best = right[0]
+        header = right[best]
+        while header != 0 and sizes[best] > 1:
+            if sizes[header] < sizes[best]:
+                best = header
+            header = right[header]
+        return best
+
+    def search(self, limit=1, budget=None):
+        """
+        Algorithm X with an explicit stack of the chosen rows instead of recursion
+        @param limit: stop after this many solutions
+        @param budget: optional started Budget, the search stops with the solutions so far when it runs out
+        @return: List of solutions, each a list of (field index, value) for the empty fields
+        """
+        solutions = []
+        if not self.consistent:
+            return solutions
+        right, down, column = self.right, self.down, self.column
+        stack = []
+        self.nodes = 0
+        while True:
+            if right[0] == 0:
+                # Every column is covered
+                solutions.append([self.candidates[row] for row in stack])
+                if len(solutions) >= limit or not stack:
+                    break
+                row = stack.pop()
+                self.deselect(row)
+                row = down[row]
+            elif budget is not None and budget.exceeded(self.nodes, len(stack)):
+                # Checked after the solution check, a solution on the last budgeted node is kept
+                break
+            else:
+                header = self.choose_column()
+                self.cover(header)
+                row = down[header]
+
+            # Go back up while the column of the current row has no rows left to try
+            while row == column[row]:
+                self.uncover(row)
+                if not stack:
+                    return solutions
+                row = stack.pop()
+                self.deselect(row)
+                row = down[row]
+
+            self.nodes += 1
+            stack.append(row)
+            self.select(row)
+
+        # Leave the matrix as it was built, so the instance can be searched again
+        while stack:
+            row = stack.pop()
+            self.deselect(row)
+            self.uncover(column[row])
+        return solutions
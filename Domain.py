@@ -0,0 +1,37 @@
+"""
+Helpers for the bitmask domain representation.
+
+A domain is stored as a single integer in which bit (v - 1) is set when the value v is still
+possible. For a 9x9 sudoku this means every domain fits in 9 bits, and even a 25x25 board only
+needs 25 bits. The domain size is the popcount of the mask and a domain is a singleton when
+only its lowest bit is set.
+"""
+
+# Number of values of a standard sudoku, the default size of a Field
+DIGITS = 9
+
+# Characters used for values in single character formats, values above 9 are written as letters
+SYMBOLS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+
+def full_mask(size):
+    """
+    Domain containing every value of a board
+    @param size: number of values, 9 for a standard sudoku
+    @return: Mask with the lowest size bits set
+    """
+    return (1 << size) - 1
+
+
+def mask_values(mask):
+    """
+    Expand a mask into the list of values it contains, in increasing order
+    @param mask: domain mask
+    @return: List of values
+    """
+    values = []
+    while mask:
+        low = mask & -mask
+        values.append(low.bit_length())
+        mask ^= low
+    return values
@@ -1,28 +1,54 @@
+from Domain import DIGITS, SYMBOLS, full_mask, mask_values
+
+
 class Field:
     # region constructors
 
-    def __init__(self, *args):
-        self.value = 0
-        self.domain = []
-        # A list of all the fields that this field is constrained by
+    def __init__(self, *args, size=DIGITS):
+        # The value and the domain bitmask are stored at position `index` of a value and a domain
+        # array. A lone field owns one-element arrays, fields on a board are bound to the arrays
+        # shared by the whole board.
+        self.values = [0]
+        self.domains = [0]
+        self.index = 0
+        # The board this field is bound to, whose topology defines the neighbours
+        self.sudoku = None
+        # Explicit list of constraining fields, only used while the field is not bound to a board
         self.neighbours = []
 
         # Constructor in case the field is unknown
         if len(args) == 0:
-            for i in range(1, 10):
-                self.domain.append(i)
+            self.domains[0] = full_mask(size)
 
         # Constructor in case the field is known, i.e., it contains a value
         if len(args) == 1:
-            self.value = args[0]
-            self.domain = []
-
+            self.values[0] = args[0]
 
+    def bind(self, sudoku, index):
+        """
+        Move this field's value and domain into the arrays of a board
+        @param sudoku: the Sudoku this field is part of
+        @param index: row-major position of this field on the board
+        """
+        sudoku.values[index] = self.values[self.index]
+        sudoku.domains[index] = self.domains[self.index]
+        self.values = sudoku.values
+        self.domains = sudoku.domains
+        self.index = index
+        self.sudoku = sudoku
 
     # endregion
 
     # region value functions
 
+    @property
+    def value(self):
+        return self.values[self.index]
+
+    @value.setter
+    def value(self, value):
+        self.values[self.index] = value
+
     def is_finalized(self):
         """
         Has this field been set to a non-zero value? If so then it is finalized.
@@ -44,7 +70,14 @@ class Field:
         self.neighbours = neighbours
 
     def get_neighbours(self):
-        return self.neighbours
+        """
+        Fields constrained by this field. For a field on a board these are looked up in the shared
+        peer table of the board instead of being stored per field.
+        @return: List of neighbouring Fields
+        """
+        if self.sudoku is None:
+            return self.neighbours
+        return self.sudoku.get_fields(self.sudoku.topology.peers[self.index])
 
     def get_other_neighbours(self, b):
         """
@@ -52,7 +85,7 @@ class Field:
         @param b:
         @return: All neighbors of this Field except b
         """
-        new_neighbours = self.neighbours.copy()
+        new_neighbours = self.get_neighbours().copy()
         new_neighbours.remove(b)
         return new_neighbours
 
@@ -61,10 +94,13 @@ class Field:
     # region domain functions
 
     def get_domain(self):
-        return self.domain
+        return mask_values(self.domains[self.index])
+
+    def get_domain_mask(self):
+        return self.domains[self.index]
 
     def get_domain_size(self):
-        return len(self.domain)
+        return self.domains[self.index].bit_count()
 
     def remove_from_domain(self, value):
         """
@@ -72,10 +108,16 @@ class Field:
         :param value: value to remove
         :return: true if the value was removed
         """
-        value_removed = self.domain.remove(value)
-        if len(self.domain) == 1:
-            self.set_value(self.domain[0])
-        return value_removed
+        mask = self.domains[self.index]
+        value_bit = 1 << (value - 1)
+        if not mask & value_bit:
+            return False
+        mask ^= value_bit
+        self.domains[self.index] = mask
+        # A single remaining bit means the domain is a singleton
+        if mask and not mask & (mask - 1):
+            self.set_value(mask.bit_length())
+        return True
 
     # endregion
 
@@ -84,16 +126,16 @@ class Field:
     def debug(self):
         """Print detailed information about the Field."""
         print(f"Field Value: {self.value}")
-        print(f"Field Domain: {self.domain}")
+        print(f"Field Domain: {self.get_domain()}")
 
 
 
     def __str__(self):
         """
-        Displays non-finalized fields with a period, otherwise displays the finalized value
+        Displays non-finalized fields with a period, otherwise displays the finalized value, using letters for values above 9
         :return:
         """
-        return "." if self.value == 0 else str(self.value)
+        return "." if self.value == 0 else SYMBOLS[self.value]
 
 
     # endregion
@@ -1,8 +1,11 @@
-from collections import deque
+from ArcQueue import ArcQueue
+from DancingLinks import DancingLinks
+from Domain import full_mask, mask_values
+from Parallel import Parallel
+from Rules import Propagator
+from SolveStats import SolveStats
 from Sudoku import Sudoku
 import time
-import matplotlib.pyplot as plt
-import pandas as pd
 import os
 sudoku_folder = os.path.join(os.path.dirname(__file__), "Sudokus")
 
@@ -11,44 +14,154 @@ sudoku_folder = os.path.join(os.path.dirname(__file__), "Sudokus")
 
 class Game:
 
-    def __init__(self, sudoku):
+    # Orderings of the initial AC-3 queue, and DLX, which solves the board as an exact cover problem instead
+    HEURISTICS = ("default", "MRV", "Degree", "ConstraintPropagation", "DLX")
+    # Ways of propagating an assignment during backtracking search
+    SEARCH_MODES = ("plain", "forward_checking", "mac")
+    # Orders in which backtracking search tries the values of a field
+    VALUE_ORDERINGS = ("none", "lcv", "cached_lcv")
+
+    def __init__(self, sudoku, quiet=False, stats=None):
+        """
+        @param sudoku: the board to solve
+        @param quiet: never write progress messages to stdout, for batch runs
+        @param stats: SolveStats to record the solves in, e.g. one that already holds the parse time or has hooks
+        """
         self.sudoku = sudoku
+        self.quiet = quiet
+        self.stats = stats if stats is not None else SolveStats()
+        # Shared static tables of the board, fields are referred to by their row-major index
+        self.topology = sudoku.topology
+        self.values = sudoku.get_values()
+        self.domains = sudoku.get_domains()
         self.ac3_iterations = 0
         self.backtrack_iterations = 0
         self.start_time = 0
+        self.search_mode = "plain"
+        self.ordering = "none"
+        # For cached_lcv: number of unassigned fields of every unit that still have a value in their domain,
+        # as candidate_counts[value - 1][unit], kept up to date during search
+        self.candidate_counts = []
+        self.counting = False
+        # Undo trail of (field index, previous domain mask) entries recorded during search
+        self.trail = []
+        # Unassigned fields per domain size and their count, maintained incrementally during search
+        self.buckets = []
+        self.unassigned = 0
+        # Optional pipeline of inference rules run together with AC-3, and the fields its rules assigned
+        self.propagator = None
+        self.newly_assigned = []
+        # Solutions found by the last solve, as single lines
+        self.solutions = []
+        # Optional limits of the current solve, see Budget
+        self.budget = None
+        # (heuristic, search) the auto heuristic chose for the last solve
+        self.auto_choice = None
+        # Bitset of the values used in every unit and its number of filled fields, kept up to date by place and clear
+        self.used = []
+        self.filled = []
+        self.rebuild_units()
+
+    @staticmethod
+    def from_string(text, quiet=False, hooks=None):
+        """
+        Parses a board and sets up a game for it, recording the parse time in its stats
+        @param text: the board in any format Sudoku.from_string reads
+        @param hooks: callbacks of the SolveStats, see SolveStats
+        """
+        stats = SolveStats(hooks)
+        with stats.phase("parse"):
+            sudoku = Sudoku.from_string(text)
+        return Game(sudoku, quiet, stats)
 
     def show_sudoku(self):
         print(self.sudoku)
 
-    def solve(self, heuristic="default", use_backtracking=False) -> bool:
+    def solve(self, heuristic="default", use_backtracking=False, search="plain", rules=None, limit=1,
+              ordering="none", budget=None) -> SolveStats:
+        """
+        Solves the board and measures the solve
+        @param heuristic: one of HEURISTICS, or "auto" to let CostModel choose the heuristic and the search mode
+        from features of the board
+        @param budget: optional Budget of node count, time, depth and cancellation for the search. When it runs
+        out the solve stops with status budget_exceeded or cancelled, the stats so far and the board as it was
+        at that point.
+        @return: The SolveStats of this solve, which is true if the constraints can be satisfied
+        """
+        stats = self.stats
+        stats.reset()
+        if heuristic == "auto":
+            # Imported here so that only auto solves load the model
+            from CostModel import CostModel
+            with stats.phase("model"):
+                self.auto_choice = CostModel.choose_configuration(self)
+            heuristic, search = self.auto_choice
+        self.budget = budget
+        if budget is not None:
+            budget.start()
+        stats.solved = self.solve_phases(heuristic, use_backtracking, search, rules, limit, ordering)
+        stats.revisions = self.ac3_iterations
+        stats.nodes = self.backtrack_iterations
+        if stats.solved:
+            stats.status = "solved"
+        elif budget is not None and budget.reason is not None:
+            stats.status = "cancelled" if budget.reason == "cancelled" else "budget_exceeded"
+            stats.budget_reason = budget.reason
+        else:
+            stats.status = "unsolved"
+        return stats
+
+    def solve_phases(self, heuristic="default", use_backtracking=False, search="plain", rules=None, limit=1,
+                     ordering="none") -> bool:
         """
         Implementation of the AC-3 algorithm
+        @param heuristic: ordering of the AC-3 queue, or "DLX" to solve with Dancing Links instead. DLX is a
+        complete search by itself, so it ignores use_backtracking, search and rules.
+        @param search: how backtracking propagates assignments, one of SEARCH_MODES
+        @param rules: inference rules to alternate with AC-3 until a fixpoint is reached, either a Propagator
+        or a list of rule names from Propagator.RULE_NAMES. None only runs AC-3.
+        @param limit: number of solutions to search for, they are collected in self.solutions
+        @param ordering: order in which backtracking tries values, one of VALUE_ORDERINGS
         @return: true if the constraints can be satisfied, false otherwise
         """
-        grid = self.sudoku.get_board()
-        queue = self.initialize_queue(grid, heuristic)
+        assert heuristic == "DLX" or search in Game.SEARCH_MODES, "Unknown search mode: " + search
+        assert ordering in Game.VALUE_ORDERINGS, "Unknown value ordering: " + ordering
+        self.search_mode = search
+        self.ordering = ordering
+        if rules is not None and not isinstance(rules, Propagator):
+            rules = Propagator(rules)
+        self.propagator = rules
         self.ac3_iterations = 0
         self.backtrack_iterations = 0
         self.start_time = time.time()
+        self.solutions = []
+
+        # AC-3 only revises empty fields, so two equal givens in a unit would only be noticed by exhausting the search
+        if not self.givens_consistent():
+            return False
 
+        if heuristic == "DLX":
+            with self.stats.phase("search"):
+                return self.exact_cover_search(limit)
 
-        while queue: #while loop, stops when queue empties
-            self.ac3_iterations += 1  # Track AC-3 iterations
-            (x,y) = queue.popleft() #Eliminate current arc (already used) on the queue
-            if self.revise(x,y):  #Reduce domain of X
-                if len(x.get_domain()) == 0: #If there are no possible values left in the domain, the sudoku is not solvable
-                    return False
-                for z in x.get_neighbours():
-                    if z != y and (z,x) not in queue:
-                        queue.append((z,x))
+        with self.stats.phase("queue"):
+            queue = self.initialize_queue(heuristic)
+        with self.stats.phase("ac3"):
+            if not self.ac3(queue):
+                return False
+        with self.stats.phase("rules"):
+            if not self.apply_rules():
+                return False
 
         is_complete = self.is_complete(self.get_assignment())
         if is_complete:
+            self.solutions.append(self.sudoku.to_line())
             return True
 
         # If not fully solved, use backtracking
         if use_backtracking:
-            return self.backtracking_search()
+            with self.stats.phase("search"):
+                return self.backtracking_search(limit)
         else:
             return False
 
@@ -56,294 +169,570 @@ class Game:
 
 
 
+    def exact_cover_search(self, limit=1) -> bool:
+        """
+        Solves the board with Dancing Links, starting from the current domains
+        @param limit: number of solutions to search for
+        @return: true if a solution was found, in which case the last one found is written to the board
+        """
+        links = DancingLinks(self.topology, self.values, self.domains)
+        solutions = links.search(limit, self.budget)
+        self.backtrack_iterations = links.nodes
+        for solution in solutions:
+            for index, value in solution:
+                if self.values[index]:
+                    self.clear(index)
+                self.place(index, value)
+                self.domains[index] = 1 << (value - 1)
+            self.solutions.append(self.sudoku.to_line())
+        self.stats.max_depth = len(solutions[0]) if solutions else 0
+        return bool(solutions)
+
+    def count_solutions(self, limit=2, heuristic="default", search="mac", rules=None, ordering="none", budget=None):
+        """
+        Counts the solutions of the puzzle with the regular propagation and search, which stops as soon as
+        limit solutions are found. A limit of 2 is enough to check that a puzzle has exactly one solution.
+        @param limit: number of solutions after which the search stops
+        @param heuristic: as in solve, DLX counts with Dancing Links
+        @param budget: optional Budget, a count cut short by it is not exact
+        @return: Dict with the number of solutions found, whether that number is exact because the search
+        finished below the limit, whether the solution is unique, the solutions as single lines and the effort
+        """
+        start_time = time.perf_counter()
+        self.solve(heuristic, True, search, rules, limit, ordering, budget)
+        count = len(self.solutions)
+        exact = count < limit and (budget is None or budget.reason is None)
+        return {
+            "count": count,
+            "exact": exact,
+            "unique": count == 1 and exact,
+            "status": self.stats.status,
+            "solutions": list(self.solutions),
+            "time": time.perf_counter() - start_time,
+            "ac3_iterations": self.ac3_iterations,
+            "backtrack_iterations": self.backtrack_iterations
+        }
+
+    def ac3(self, queue) -> bool:
+        """
+        Revises arcs until the queue is empty
+        @param queue: ArcQueue of (x, y) field index pairs
+        @return: false if a domain became empty
+        """
+        peers = self.topology.peers
+        domains = self.domains
+        stats = self.stats
+        stats.queue_high_water = max(stats.queue_high_water, len(queue))
+
+        while queue: #while loop, stops when queue empties
+            self.ac3_iterations += 1  # Track AC-3 iterations
+            (x,y) = queue.popleft() #Eliminate current arc (already used) on the queue
+            if self.revise(x,y):  #Reduce domain of X
+                stats.reductions += 1
+                if domains[x] == 0: #If there are no possible values left in the domain, the sudoku is not solvable
+                    return False
+                for z in peers[x]:
+                    if z != y:
+                        queue.append((z,x)) #Skipped in O(1) when the arc is already queued
+                if len(queue) > stats.queue_high_water:
+                    stats.queue_high_water = len(queue)
+        return True
+
+    def apply_rules(self) -> bool:
+        """
+        Alternates the inference rules with AC-3 until neither changes a domain anymore
+        @return: false if a contradiction was found
+        """
+        if self.propagator is None:
+            return True
+        peers = self.topology.peers
+        while True:
+            hits = self.propagator.total_hits()
+            self.newly_assigned = []
+            if not self.propagator.apply(self):
+                return False
+            if self.propagator.total_hits() == hits:
+                return True  # Fixpoint reached
+            # Fields assigned by a rule constrain their neighbours through the arcs towards them
+            queue = ArcQueue((z, x) for x in self.newly_assigned for z in peers[x])
+            if not self.ac3(queue):
+                return False
+
+    def restrict(self, index, mask) -> bool:
+        """
+        Shrinks a domain outside of search, assigning the field when a single value is left
+        @param index: field index
+        @param mask: the new domain, a subset of the current one
+        @return: false if the domain became empty
+        """
+        self.domains[index] = mask
+        self.stats.reductions += 1
+        if mask == 0:
+            return False
+        if not mask & (mask - 1):
+            self.place(index, mask.bit_length())
+            self.newly_assigned.append(index)
+        return True
+
     def revise(self, x, y) -> bool:
         """
         Checks ach value in X's domain to see if there's a compatible value in Y's domain. For Sudoku, compatibility is x != y
-        @return: true if the sudoku solution is correct
+        @param x: index of field X
+        @param y: index of field Y
+        @return: true if the domain of X was reduced
         """
-        # TODO: implement valid_solution function
-        revised = False
-        domain_x = x.get_domain()
-        value_y = y.get_value()
+        value_y = self.values[y]
+
+        # Single bit test against X's domain mask instead of a list scan
+        if value_y != 0 and self.domains[x] & (1 << (value_y - 1)):
+            mask = self.domains[x] ^ (1 << (value_y - 1))
+            self.domains[x] = mask
+            if mask and not mask & (mask - 1): #A singleton domain assigns its last value to the field
+                self.place(x, mask.bit_length())
+            return True
 
-        if value_y != '.' and value_y in domain_x:
-            x.remove_from_domain(value_y)
-            revised = True
+        return False
 
-        return revised
 
+    def givens_consistent(self) -> bool:
+        """
+        Checks that no value is given twice in a unit
+        @return: false if the filled fields already contradict each other
+        """
+        filled = self.filled
+        # A repeated value sets no new bit, so the unit has more filled fields than used values
+        return all(used.bit_count() == filled[unit] for unit, used in enumerate(self.used))
 
     def valid_solution(self) -> bool:
         """
         Checks the validity of a sudoku solution
         @return: true if the sudoku solution is correct
         """
-        # TODO: implement valid_solution function
-
-        grid = self.sudoku.get_board()
-
-        #Check rows, columns, and 3x3 boxes
-        for i in range(9):
-            row_values = set()
-            col_values = set()
-
-
-            for j in range(9):
-                row_value = grid[i][j].get_value()
-                col_value = grid[j][i].get_value()
-
-                if row_value in row_values or col_value in col_values:
-                    return False  # Duplicate found, invalid solution
-
-                row_values.add(row_value)
-                col_values.add(col_value)
-
-
-        # Check 3x3 subgrids
-        for box_row in range(0, 9, 3):
-            for box_col in range(0, 9, 3):
-                box_values = set()
-                for i in range(3):
-                    for j in range(3):
-                        val = grid[box_row + i][box_col + j].get_value()
-                        if val in box_values:
-                            return False
-                        box_values.add(val)
+        full = full_mask(self.topology.size)
+        size = self.topology.size
+        filled = self.filled
+
+        with self.stats.phase("validation"):
+            #Check rows, columns, and boxes: every unit is filled and uses every value, so none is repeated
+            for unit, used in enumerate(self.used):
+                if used != full or filled[unit] != size:
+                    return False
 
-        print("Sudoku solution is valid!")
+        if not self.quiet:
+            print("Sudoku solution is valid!")
         return True
 
 
 
 
-    def initialize_queue(self, grid, heuristic="default"):
+    def initialize_queue(self, heuristic="default"):
         """
         Initializes the queue with different heuristics.
-        :param grid: The Sudoku board.
         :param heuristic: The heuristic to use ("MRV", "Degree", "ConstraintPropagation", etc.).
-        :return: The initialized queue.
+        :return: The initialized queue of (x, y) field index pairs.
         """
-        queue = deque()
+        peers = self.topology.peers
+        cells = range(self.topology.cell_count)
 
         if heuristic == "MRV":
-        # Sort all arcs based on the domain size of X
-            arcs = []
-            for i in range(9):
-                for j in range(9):
-                    field = grid[i][j]
-                    for neighbor in field.get_neighbours():
-                        arcs.append((len(field.get_domain()), id(field), field, neighbor))
-
-            arcs.sort(key=lambda arc: (arc[0], arc[1]))  # Sort by domain size first, then tie-break with id
-            queue.extend([(x, y) for _, _, x, y in arcs])
+            # Sort all arcs based on the domain size of X, ties keep the board order
+            domains = self.domains
+            order = sorted(cells, key=lambda cell: domains[cell].bit_count())
+            queue = ArcQueue((x, y) for x in order for y in peers[x])
 
 
         elif heuristic == "Degree":
-            # Sort based on the number of constraints (neighbors)
-            arcs = []
-            for i in range(9):
-                for j in range(9):
-                    field = grid[i][j]
-                    for neighbor in field.get_neighbours():
-                        arcs.append((-len(field.get_neighbours()), id(field), field, neighbor))
-
-            arcs.sort(key=lambda arc: (arc[0], arc[1]))  # Most constrained variable first
-            queue.extend([(x, y) for _, _, x, y in arcs])
+            # Sort based on the number of constraints (neighbors), most constrained variable first
+            order = sorted(cells, key=lambda cell: -len(peers[cell]))
+            queue = ArcQueue((x, y) for x in order for y in peers[x])
 
 
         elif heuristic == "ConstraintPropagation":
+            values = self.values
             priority_arcs = []
             normal_arcs = []
-            for i in range(9):
-                for j in range(9):
-                    field = grid[i][j]
-                    for neighbour in field.get_neighbours():
-                        if neighbour.get_value() != 0:
-                            priority_arcs.append((field, neighbour))  # Prioritize arcs where Y is assigned
-                        else:
-                            normal_arcs.append((field, neighbour))
-            queue = deque(priority_arcs + normal_arcs) #makes a complete queue with the priority arcs first and the other at the end
+            for x in cells:
+                for y in peers[x]:
+                    if values[y] != 0:
+                        priority_arcs.append((x, y))  # Prioritize arcs where Y is assigned
+                    else:
+                        normal_arcs.append((x, y))
+            queue = ArcQueue(priority_arcs + normal_arcs) #makes a complete queue with the priority arcs first and the other at the end
 
 
         else:  # Default, does normal order going left to right for each row top down
-            queue = deque()
-            for i in range(9):
-                for j in range(9):
-                    field = grid[i][j]
-                    for neighbour in field.get_neighbours():
-                        queue.append((field, neighbour))
+            queue = ArcQueue((x, y) for x in cells for y in peers[x])
 
         return queue
 
-    def backtracking_search(self):
+    def backtracking_search(self, limit=1):
         """
-        Solves the Sudoku using backtracking search.
+        Solves the Sudoku using backtracking search. The search is iterative: every frame of the explicit
+        stack holds a variable, its ordered candidate values, the position of the next value to try and the
+        trail mark to undo to, so the depth of the search is not limited by the recursion limit.
+        :param limit: number of solutions to search for
         :return: True if solved, False otherwise.
         """
-        print("Starting Backtracking Search...")
-        assignment = self.get_assignment()
-        result = self.backtrack(assignment)
-        if result is not None:
-            print("Sudoku solved with backtracking!")
-            return True
-        print("Backtracking failed to find a solution.")
-        return False
-
-    def backtrack(self, assignment):
+        if not self.quiet:
+            print("Starting Backtracking Search...")
+        solved = self.search(limit)
+        if not self.quiet:
+            if solved:
+                print("Sudoku solved with backtracking!")
+            else:
+                print("Backtracking failed to find a solution.")
+        return solved
+
+    def search(self, limit=1) -> bool:
+        """
+        The search loop of backtracking_search, which never writes to stdout. Every solution is appended to
+        self.solutions, and after a solution the search goes on with the next value until limit solutions are found.
+        :param limit: number of solutions after which the search stops
+        :return: True if a solution was found. The board holds the last solution only when the limit was reached.
+        When self.budget runs out the search stops where it is and returns whether it found a solution before.
+        """
+        self.reset_search_state()
+        values = self.values
+        stats = self.stats
+        budget = self.budget
+        node_hook = stats.hooks.get("node")
+        backtrack_hook = stats.hooks.get("backtrack")
+        solution_hook = stats.hooks.get("solution")
         self.backtrack_iterations += 1
+        if self.unassigned == 0:
+            self.solutions.append(self.sudoku.to_line())
+            if solution_hook:
+                solution_hook(len(self.solutions))
+            return True
 
-        if self.is_complete(assignment):
-            print("Solution found!")
-            return assignment
-
-        var = self.select_unassigned_variable(assignment)
-        if var is None:
-            return None  # Prevents infinite recursion
-
-        for value in self.order_domain_values(var, assignment):
-            if self.is_consistent(var, value, assignment):
-                var.set_value(value)
-                assignment[var] = value
-
+        # The board is the assignment, the helpers below read values, domains and buckets instead of a dict
+        var = self.select_unassigned_variable(None)
+        stack = [[var, self.order_domain_values(var, None), 0, len(self.trail)]]
+        stats.max_depth = max(stats.max_depth, 1)
+        while stack:
+            frame = stack[-1]
+            var, candidates, position, mark = frame
+
+            # Retract the value tried previously in this frame
+            if values[var] != 0:
+                self.undo(mark)
+                self.unassign(var)
+
+            while position < len(candidates) and not self.is_consistent(var, candidates[position], None):
+                position += 1
+            if position == len(candidates):
+                stack.pop()  # All values failed, triggers backtracking in the frame below
+                stats.backtracks += 1
+                if backtrack_hook:
+                    backtrack_hook(len(stack))
+                continue
+            value = candidates[position]
+            frame[2] = position + 1
+
+            self.assign(var, value)
+            consistent = self.propagate(var, value)
+            stats.reductions += len(self.trail) - mark  # Every domain change of the propagation is on the trail
+            if consistent:
+                self.backtrack_iterations += 1
+                if node_hook:
+                    node_hook(len(stack), var, value)
+                solved = self.unassigned == 0
+                if solved:
+                    self.solutions.append(self.sudoku.to_line())
+                    if solution_hook:
+                        solution_hook(len(self.solutions))
+                    if len(self.solutions) >= limit:
+                        return True  # Enough solutions found
+                # The budget is checked after the solution check, a solution on the last budgeted node is kept
+                if budget is not None and budget.exceeded(self.backtrack_iterations, len(stack)):
+                    return bool(self.solutions)
+                if solved:
+                    continue  # Retracts this value and tries the next one of the frame
+                var = self.select_unassigned_variable(None)
+                stack.append([var, self.order_domain_values(var, None), 0, len(self.trail)])
+                if len(stack) > stats.max_depth:
+                    stats.max_depth = len(stack)
+
+        return bool(self.solutions)
+
+    def reset_search_state(self):
+        """
+        Sets up the incremental search state: an empty trail, the number of unassigned fields, the
+        unassigned fields bucketed by domain size, which is what MRV selects from, and for cached_lcv the
+        candidate counts of the units
+        """
+        self.trail = []
+        self.buckets = [set() for _ in range(self.topology.size + 1)]
+        self.unassigned = 0
+        self.counting = self.ordering == "cached_lcv"
+        self.candidate_counts = [[0] * len(self.topology.units) for _ in range(self.topology.size)] if self.counting else []
+        for index, value in enumerate(self.values):
+            if value == 0:
+                self.buckets[self.domains[index].bit_count()].add(index)
+                self.unassigned += 1
+                if self.counting:
+                    self.count_candidates(index, self.domains[index], 1)
+
+    def count_candidates(self, index, mask, delta):
+        """
+        Adds delta to the candidate counts of the units of a field for every value in mask
+        @param index: an unassigned field, or one that is about to be assigned or was just unassigned
+        @param mask: values that entered (delta 1) or left (delta -1) the candidates of the field
+        """
+        row, column, box = self.topology.cell_units[index]
+        while mask:
+            value_bit = mask & -mask
+            mask ^= value_bit
+            counts = self.candidate_counts[value_bit.bit_length() - 1]
+            counts[row] += delta
+            counts[column] += delta
+            counts[box] += delta
+
+    def assign(self, var, value):
+        """Sets the value of an unassigned field and removes it from the MRV buckets"""
+        self.buckets[self.domains[var].bit_count()].remove(var)
+        self.unassigned -= 1
+        if self.counting:
+            self.count_candidates(var, self.domains[var], -1)
+        self.place(var, value)
+
+    def unassign(self, var):
+        """Clears the value of a field and puts it back in the MRV bucket of its current domain size"""
+        self.clear(var)
+        self.unassigned += 1
+        self.buckets[self.domains[var].bit_count()].add(var)
+        if self.counting:
+            self.count_candidates(var, self.domains[var], 1)
+
+    def propagate(self, var, value) -> bool:
+        """
+        Prunes the domains of unassigned neighbours after assigning a value, according to the search mode.
+        Forward checking removes the value from the neighbours of var. MAC also propagates every domain that
+        becomes a singleton, which for the != constraints of a sudoku makes all arcs consistent again.
+        Every domain change is recorded on the trail.
+        @return: false if a domain became empty, i.e. the assignment cannot lead to a solution
+        """
+        if self.search_mode == "plain":
+            return True
 
-                result = self.backtrack(assignment)
-                if result is not None:
-                    return result  # Solution found
-                # Backtrack: reset the Field's value and remove from assignment
-                var.set_value(0)
-                del assignment[var]
+        values = self.values
+        domains = self.domains
+        peers = self.topology.peers
+        trail = self.trail
+        buckets = self.buckets
+        mac = self.search_mode == "mac"
+        counting = self.counting
+        cell_units = self.topology.cell_units
+
+        trail.append((var, domains[var]))
+        domains[var] = 1 << (value - 1)
+        pending = [var]
+        while pending:
+            cell = pending.pop()
+            value_bit = domains[cell]
+            if counting:
+                counts = self.candidate_counts[value_bit.bit_length() - 1]
+            for peer in peers[cell]:
+                mask = domains[peer]
+                if values[peer] == 0 and mask & value_bit:
+                    trail.append((peer, mask))
+                    size = mask.bit_count()
+                    buckets[size].remove(peer)
+                    buckets[size - 1].add(peer)
+                    mask ^= value_bit
+                    domains[peer] = mask
+                    if counting:
+                        row, column, box = cell_units[peer]
+                        counts[row] -= 1
+                        counts[column] -= 1
+                        counts[box] -= 1
+                    if mask == 0:
+                        return False
+                    if mac and not mask & (mask - 1):
+                        pending.append(peer)
+            if not mac:
+                break
+        return True
 
-        return None  # Failure, triggers backtracking
+    def undo(self, mark):
+        """
+        Restores all domains changed since the trail had length mark, newest change first
+        @param mark: length of the trail to return to
+        """
+        values = self.values
+        domains = self.domains
+        buckets = self.buckets
+        trail = self.trail
+        counting = self.counting
+        cell_units = self.topology.cell_units
+        while len(trail) > mark:
+            index, mask = trail.pop()
+            if values[index] == 0:
+                buckets[domains[index].bit_count()].remove(index)
+                buckets[mask.bit_count()].add(index)
+                if counting:
+                    # Unassigned fields are only on the trail for the removal of a single value
+                    counts = self.candidate_counts[(mask ^ domains[index]).bit_length() - 1]
+                    row, column, box = cell_units[index]
+                    counts[row] += 1
+                    counts[column] += 1
+                    counts[box] += 1
+            domains[index] = mask
 
 
     def get_assignment(self):
-        """Returns the current assignment (filled and unfilled cells)."""
-        assignment = {cell: cell.get_value() for row in self.sudoku.get_board() for cell in row if cell.get_value() != 0}
+        """Returns the current assignment as a dict of field index to value, for the filled cells."""
+        assignment = {index: value for index, value in enumerate(self.values) if value != 0}
         return assignment
 
 
 
     def is_complete(self, assignment) -> bool:
         """Checks if all cells are assigned."""
-        return all(cell.get_value() != 0 for row in self.sudoku.get_board() for cell in row)
+        return 0 not in self.values
 
     def select_unassigned_variable(self, assignment):
-        """Selects the next empty cell using MRV heuristic."""
-        unassigned = [cell for row in self.sudoku.get_board() for cell in row if cell.get_value() == 0]  # Only select cells that are truly empty
-        if not unassigned:
-            return None  # No unassigned variables left
-        return min(unassigned, key=lambda cell: len(cell.get_domain()))  # MRV heuristic
+        """Selects the index of the next empty cell using MRV heuristic, from the buckets kept up to date by the search."""
+        for bucket in self.buckets:  # Smallest domain size first, an empty domain is a dead end that fails at once
+            if bucket:
+                return min(bucket)  # Ties are broken in board order
+        return None  # No unassigned variables left
 
     def order_domain_values(self, var, assignment):
-        """Orders domain values using LCV heuristic."""
-        return sorted(var.get_domain(), key=lambda val: self.count_conflicts(var, val, assignment))
+        """
+        Orders the values of a domain according to self.ordering. none keeps increasing order. lcv (least
+        constraining value) puts first the values that the fewest unassigned neighbours still have in their
+        domain, found by scanning the neighbours. cached_lcv estimates the same from the candidate counts of
+        the three units of the field, without looking at the neighbours; fields in both the row or column and
+        the box are counted twice.
+        """
+        values = mask_values(self.domains[var])
+        if self.ordering == "lcv":
+            return sorted(values, key=lambda value: self.count_constrained(var, value))
+        if self.ordering == "cached_lcv":
+            counts = self.candidate_counts
+            row, column, box = self.topology.cell_units[var]
+            return sorted(values, key=lambda value: counts[value - 1][row] + counts[value - 1][column]
+                          + counts[value - 1][box])
+        return values
 
     def is_consistent(self, var, value, assignment) -> bool:
-        """Checks if a value can be assigned to a cell without conflicts."""
-        conflicts = [neighbor for neighbor in var.get_neighbours() if neighbor.get_value() == value]
-        return not conflicts  # Ensures no neighbors have the same value
-
-    def count_conflicts(self, var, value, assignment):
-        """Counts how many conflicts a value causes (for LCV heuristic)."""
-        return sum(1 for neighbor in var.get_neighbours() if neighbor.get_value() == value)
+        """Checks if a value can be assigned to a cell without conflicts, with one bit test on the values used in its units."""
+        row, column, box = self.topology.cell_units[var]
+        used = self.used
+        return not (used[row] | used[column] | used[box]) & (1 << (value - 1))  # Ensures no neighbors have the same value
+
+    def count_constrained(self, var, value):
+        """Counts the unassigned neighbours that still have a value in their domain (for LCV heuristic)."""
+        value_bit = 1 << (value - 1)
+        values = self.values
+        domains = self.domains
+        return sum(1 for neighbor in self.topology.peers[var] if values[neighbor] == 0 and domains[neighbor] & value_bit)
+
+    def place(self, index, value):
+        """Sets the value of an empty field and records it in the bitsets of its units"""
+        self.values[index] = value
+        value_bit = 1 << (value - 1)
+        used = self.used
+        filled = self.filled
+        for unit in self.topology.cell_units[index]:
+            used[unit] |= value_bit
+            filled[unit] += 1
+
+    def clear(self, index):
+        """Empties a field set by place, removing its value from the bitsets of its units"""
+        value_bit = 1 << (self.values[index] - 1)
+        self.values[index] = 0
+        used = self.used
+        filled = self.filled
+        for unit in self.topology.cell_units[index]:
+            used[unit] &= ~value_bit
+            filled[unit] -= 1
+
+    def rebuild_units(self):
+        """Recomputes the unit bitsets from the board, needed only after its values were written directly"""
+        self.used = [0] * len(self.topology.units)
+        self.filled = [0] * len(self.topology.units)
+        for index, value in enumerate(self.values):
+            if value:
+                self.place(index, value)
 
 
 
     @staticmethod
-    def complexity_study():
-        heuristics = ["default", "MRV", "Degree", "ConstraintPropagation"]
-        puzzles = ["sudoku1.txt", "sudoku2.txt", "sudoku3.txt"]
-        results = []
+    def complexity_study(workers=1, chunksize=1):
+        """
+        Runs every combination of puzzle, heuristic, backtracking and value ordering and reports the results
+        @param workers: number of worker processes to spread the runs over
+        @param chunksize: number of runs sent to a worker at once
+        """
+        heuristics = Game.HEURISTICS
+        puzzles = ["Sudoku1.txt", "Sudoku2.txt", "Sudoku3.txt"]
 
+        # Workers receive the puzzle as a line of 81 characters instead of a pickled board
+        jobs = []
         for puzzle in puzzles:
-            puzzle_path = os.path.join(sudoku_folder, puzzle)
-
+            grid = Sudoku(os.path.join(sudoku_folder, puzzle)).to_line()
             for heuristic in heuristics:
                 for backtracking in [False, True]:
-                    # Test without backtracking
-                    game = Game(Sudoku(puzzle_path))
-                    success, time_taken, iterations = Game.run_solver(game, heuristic, False)
-                    results.append({
-                        "Puzzle": puzzle,
-                        "Heuristic": heuristic,
-                        "Backtracking": False,
-                        "Time": time_taken,
-                        "Iterations": iterations,
-                        "Solved": success
-                    })
-
-                    # Test with backtracking
-                    game = Game(Sudoku(puzzle_path))
-                    success, time_taken, iterations = Game.run_solver(game, heuristic, True)
-                    results.append({
-                        "Puzzle": puzzle,
-                        "Heuristic": heuristic,
-                        "Backtracking": True,
-                        "Time": time_taken,
-                        "Iterations": iterations,
-                        "Solved": success
-                    })
+                    for ordering in Game.study_orderings(heuristic, backtracking):
+                        jobs.append((puzzle, grid, heuristic, backtracking, ordering))
+
+        results = list(Parallel.ordered_map(Game.study_job, jobs, workers, chunksize))
 
         # Generate report and plots
         Game.generate_report(results)
 
     @staticmethod
-    def run_solver(game, heuristic, use_backtracking):
+    def study_orderings(heuristic, backtracking):
+        """Value orderings worth comparing for a configuration, they only matter for backtracking search"""
+        if backtracking and heuristic != "DLX":
+            return Game.VALUE_ORDERINGS
+        return ("none",)
+
+    @staticmethod
+    def study_job(job):
+        """
+        Runs a single configuration of the complexity study
+        @param job: Tuple of (puzzle name, puzzle line, heuristic, backtracking, value ordering)
+        @return: Result row of the study
+        """
+        puzzle, grid, heuristic, backtracking, ordering = job
+        game = Game(Sudoku.from_string(grid), quiet=True)
+        success, time_taken, iterations = Game.run_solver(game, heuristic, backtracking, ordering)
+        return {
+            "Puzzle": puzzle,
+            "Heuristic": heuristic,
+            "Backtracking": backtracking,
+            "Ordering": ordering,
+            "Time": time_taken,
+            "Iterations": iterations,
+            "Solved": success
+        }
+
+    @staticmethod
+    def run_solver(game, heuristic, use_backtracking, ordering="none"):
         game.ac3_iterations = 0  # Reset AC-3 iteration counter
         game.backtrack_iterations = 0  # Reset backtracking iteration counter
-        start_time = time.time()
+        start_time = time.perf_counter()
 
         try:
-            solved = game.solve(heuristic, use_backtracking)
+            solved = game.solve(heuristic, use_backtracking, ordering=ordering)
             valid = game.valid_solution() if solved else False
-        except:
-            solved = False
+        except Exception:
+            # A crash counts as unsolved, but is reported instead of silently hiding it
+            import traceback
+            traceback.print_exc()
             valid = False
 
         return (
             valid,
-            time.time() - start_time,
+            time.perf_counter() - start_time,
             game.ac3_iterations + game.backtrack_iterations  # Total iterations
         )
 
     @staticmethod
     def generate_report(results):
-        df = pd.DataFrame(results)
-
-        # Print summary table
-        print("\n=== Summary Table ===")
-        print(df.groupby(['Heuristic', 'Backtracking']).agg({
-            'Solved': 'mean',
-            'Time': 'mean',
-            'Iterations': 'mean'
-        }))
-
-        # Plotting
-        fig, ax = plt.subplots(2, 1, figsize=(12, 10))
-
-        # Time plot
-        df.groupby(['Heuristic', 'Backtracking'])['Time'].mean().unstack().plot(
-            kind='bar',
-            ax=ax[0],
-            title='Average Solving Time by Heuristic'
-        )
-        ax[0].tick_params(axis='x', rotation=0)  # <-- Rotate labels horizontally
-
-
-        # Iterations plot
-        df.groupby(['Heuristic', 'Backtracking'])['Iterations'].mean().unstack().plot(
-            kind='bar',
-            ax=ax[1],
-            title='Average Iterations by Heuristic'
-        )
-        ax[1].tick_params(axis='x', rotation=0)  # <-- Rotate labels horizontally
-
-
-        plt.tight_layout()
-        save_path = os.path.join(os.getcwd(), 'complexity_report.png')
-        plt.savefig('complexity_report.png')
-        print(f"Graph saved successfully at: {save_path}")  # Confirm save location
-        plt.show()
-        plt.close()
-
-
+        # Imported here so that solving never pays for loading pandas and matplotlib
+        from Report import Report
+        Report.generate_report(results)
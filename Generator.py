@@ -0,0 +1,190 @@
+import argparse
+import csv
+import random
+import time
+from contextlib import nullcontext
+from DancingLinks import DancingLinks
+from Domain import SYMBOLS, full_mask
+from Game import Game
+from Parallel import Parallel
+from Rules import Propagator
+from Sudoku import Sudoku
+from Topology import Topology
+
+
+class Generator:
+    """
+    Generates puzzles with a unique solution and grades them with the effort the solver needs.
+    A random complete grid is built first, then clues are removed in random order as long as the
+    puzzle keeps a single solution, so every generated puzzle is minimal. Every puzzle is generated
+    from its own seed, derived from the run seed and its index, so a run gives the same puzzles for
+    any number of workers.
+    """
+
+    # From easiest to hardest: solved by AC-3 alone, by AC-3 with the inference rules, with a small search, with a large search
+    GRADES = ("easy", "medium", "hard", "expert")
+    # Search nodes above which a puzzle that needs search is graded expert
+    EXPERT_NODES = 50
+    STATS_FIELDS = ["index", "grade", "clues", "time", "ac3_iterations", "backtrack_iterations", "rules_fired"]
+
+    def __init__(self, box_size=3, symmetric=False):
+        """
+        @param box_size: 3 for 9x9 puzzles, 4 for 16x16, ...
+        @param symmetric: remove clues in pairs that are symmetric under a half turn of the board
+        """
+        self.topology = Topology.for_box_size(box_size)
+        self.symmetric = symmetric
+
+    def complete_grid(self, rng):
+        """
+        A random solved board. The boxes on the diagonal do not constrain each other, so they are
+        filled with random permutations and the rest of the board is solved with Dancing Links.
+        @param rng: random.Random instance
+        @return: Row-major list of values
+        """
+        topology = self.topology
+        values = [0] * topology.cell_count
+        for box_number in range(0, topology.size, topology.box_size + 1):
+            digits = list(range(1, topology.size + 1))
+            rng.shuffle(digits)
+            for index, value in zip(topology.boxes[box_number], digits):
+                values[index] = value
+        solution = DancingLinks(topology, values, self.domains(values)).search()[0]
+        for index, value in solution:
+            values[index] = value
+        return values
+
+    def domains(self, values):
+        """Full domains for the empty fields, which is all DancingLinks needs"""
+        full = full_mask(self.topology.size)
+        return [0 if value else full for value in values]
+
+    def keeps_unique(self, values, removed) -> bool:
+        """
+        Checks that a puzzle with a unique solution still has one after emptying some of its fields. Any other
+        solution has to differ from the known one in a removed field, so instead of counting solutions it is
+        enough to look for a solution that differs in the first removed field, or keeps that one and differs in
+        the second, and so on. Proving that no such solution exists is much cheaper than exhausting the search.
+        @param values: row-major list of values with the removed fields already emptied
+        @param removed: (field index, value) of every emptied field
+        @return: true if the solution is still unique
+        """
+        trial = list(values)
+        for index, value in removed:
+            domains = self.domains(trial)
+            domains[index] &= ~(1 << (value - 1))
+            if DancingLinks(self.topology, trial, domains).search():
+                return False
+            trial[index] = value
+        return True
+
+    def remove_clues(self, values, rng):
+        """
+        Empties fields in random order, putting a value back whenever removing it allows a second solution
+        @param values: row-major list of the values of a solved board, updated in place
+        @param rng: random.Random instance
+        @return: The same list, now a puzzle with a unique solution
+        """
+        cells = list(range(self.topology.cell_count))
+        rng.shuffle(cells)
+        last = self.topology.cell_count - 1
+        for cell in cells:
+            group = {cell, last - cell} if self.symmetric else {cell}
+            removed = [(index, values[index]) for index in group if values[index]]
+            if not removed:
+                continue
+            for index, _ in removed:
+                values[index] = 0
+            if not self.keeps_unique(values, removed):
+                for index, value in removed:
+                    values[index] = value
+        return values
+
+    @staticmethod
+    def grade(line):
+        """
+        Grades a puzzle by solving it with AC-3, all inference rules and MAC search
+        @param line: the puzzle on a single line
+        @return: Tuple of the grade and a dict of the effort metrics
+        """
+        game = Game(Sudoku.from_string(line), quiet=True)
+        game.solve("default", True, "mac", Propagator())
+        rules_fired = game.propagator.total_hits()
+        if game.backtrack_iterations == 0:
+            grade = "easy" if rules_fired == 0 else "medium"
+        else:
+            grade = "hard" if game.backtrack_iterations <= Generator.EXPERT_NODES else "expert"
+        return grade, {
+            "ac3_iterations": game.ac3_iterations,
+            "backtrack_iterations": game.backtrack_iterations,
+            "rules_fired": rules_fired
+        }
+
+    @staticmethod
+    def generate_puzzle(index, seed=0, box_size=3, symmetric=False):
+        """
+        Generates and grades one puzzle
+        @param index: number of the puzzle in the run, together with seed it fixes the random choices
+        @return: Tuple of the puzzle on a single line, with 0 for empty fields, and a dict of stats
+        """
+        start_time = time.perf_counter()
+        generator = Generator(box_size, symmetric)
+        rng = random.Random(f"{seed}:{index}")
+        values = generator.remove_clues(generator.complete_grid(rng), rng)
+        line = "".join(SYMBOLS[value] for value in values)
+        grade, stats = Generator.grade(line)
+        stats.update({
+            "grade": grade,
+            "clues": sum(1 for value in values if value),
+            "time": time.perf_counter() - start_time
+        })
+        return line, stats
+
+    @staticmethod
+    def generate_batch(output_file, count, seed=0, stats_file=None, workers=1, chunksize=16, box_size=3,
+                       symmetric=False, grades=None):
+        """
+        Generates puzzles and writes them one per line as soon as they are done, in the order of their index
+        @param count: number of puzzles to generate
+        @param seed: seed of the run, the same seed gives the same puzzles
+        @param stats_file: optional CSV file for the grade and effort of every written puzzle
+        @param workers: number of worker processes
+        @param chunksize: number of puzzles sent to a worker at once
+        @param grades: only write puzzles of these grades, None writes all
+        @return: Dict of grade to the number of puzzles of that grade that were generated
+        """
+        counts = dict.fromkeys(Generator.GRADES, 0)
+        stats_context = open(stats_file, "w", newline="") if stats_file else nullcontext()
+        with open(output_file, "w") as output, stats_context as stats_output:
+            stats_writer = None
+            if stats_output is not None:
+                stats_writer = csv.DictWriter(stats_output, fieldnames=Generator.STATS_FIELDS)
+                stats_writer.writeheader()
+            results = Parallel.ordered_map(Generator.generate_puzzle, range(count), workers, chunksize,
+                                           (seed, box_size, symmetric))
+            for index, (line, stats) in enumerate(results):
+                counts[stats["grade"]] += 1
+                if grades and stats["grade"] not in grades:
+                    continue
+                output.write(line + "\n")
+                if stats_writer is not None:
+                    stats_writer.writerow({"index": index, **stats})
+        return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate graded sudokus with a unique solution")
+    parser.add_argument("output", help="file to write the puzzles to, one per line")
+    parser.add_argument("--count", type=int, default=100, help="number of puzzles to generate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stats", help="CSV file to write the grade and solver effort of every puzzle to")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes, 0 uses all cores")
+    parser.add_argument("--chunksize", type=int, default=16)
+    parser.add_argument("--box-size", type=int, default=3, help="3 for 9x9 puzzles, 4 for 16x16")
+    parser.add_argument("--symmetric", action="store_true", help="keep the clues symmetric under a half turn")
+    parser.add_argument("--grades", nargs="+", choices=Generator.GRADES, help="only keep puzzles of these grades")
+    args = parser.parse_args()
+
+    counts = Generator.generate_batch(args.output, args.count, args.seed, args.stats, args.workers, args.chunksize,
+                                      args.box_size, args.symmetric, args.grades)
+    print(", ".join(f"{grade}: {number}" for grade, number in counts.items()))
@@ -0,0 +1,194 @@
+import argparse
+import mmap
+import struct
+from math import isqrt
+from Domain import SYMBOLS
+from Sudoku import Sudoku
+
+
+class GridFile:
+    """
+    Binary archive of boards as fixed-size records, read through a memory map so that record k is found
+    by its offset without parsing anything before it.
+
+    The file starts with a 16 byte header: the magic bytes SDKG, the format version, the box size (3 for
+    9x9 boards), the encoding and the size of a record in bytes. Every record holds the values of one board
+    in row-major order, 0 for empty fields, either one byte per field or, for boards with values up to 15,
+    two fields per byte with the first field in the high nibble. A 9x9 board takes 81 or 41 bytes.
+    """
+
+    MAGIC = b"SDKG"
+    VERSION = 1
+    BYTES = 0
+    NIBBLES = 1
+    HEADER = struct.Struct("<4sBBBxI4x")
+    # The two values of every packed byte, high nibble first
+    NIBBLE_PAIRS = [(byte >> 4, byte & 15) for byte in range(256)]
+
+    def __init__(self, filename):
+        """
+        Opens an archive for reading
+        @param filename: file written by GridFile.write
+        """
+        self.file = open(filename, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.box_size, self.encoding, self.record_size = GridFile.HEADER.unpack_from(self.map)
+        if magic != GridFile.MAGIC or version != GridFile.VERSION:
+            self.close()
+            raise ValueError(f"{filename} is not a grid file of version {GridFile.VERSION}")
+        self.cell_count = self.box_size ** 4
+        self.view = memoryview(self.map)[GridFile.HEADER.size:]
+        self.count = len(self.view) // self.record_size
+
+    def __len__(self):
+        return self.count
+
+    def record(self, index):
+        """
+        @param index: number of the record, negative numbers count from the end
+        @return: The raw bytes of the record as a memoryview into the file, without copying
+        """
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("record index out of range")
+        start = index * self.record_size
+        return self.view[start:start + self.record_size]
+
+    def values(self, index):
+        """
+        @return: Row-major list of the values of board index, 0 for empty fields
+        """
+        record = self.record(index)
+        if self.encoding == GridFile.BYTES:
+            return list(record)
+        pairs = GridFile.NIBBLE_PAIRS
+        values = [value for byte in record for value in pairs[byte]]
+        del values[self.cell_count:]  # Padding nibble of an odd number of fields
+        return values
+
+    def __getitem__(self, index):
+        return self.values(index)
+
+    def line(self, index):
+        """
+        @return: Board index on a single line with 0 for empty fields, a format Sudoku.from_string reads
+        """
+        return "".join(SYMBOLS[value] for value in self.values(index))
+
+    def lines(self):
+        """Generator of all boards on a single line, in file order"""
+        for index in range(self.count):
+            yield self.line(index)
+
+    def close(self):
+        if getattr(self, "view", None) is not None:
+            self.view.release()
+            self.view = None
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def is_grid_file(filename) -> bool:
+        with open(filename, "rb") as file:
+            return file.read(len(GridFile.MAGIC)) == GridFile.MAGIC
+
+    @staticmethod
+    def encode(values, encoding):
+        """
+        @param values: row-major list of values
+        @param encoding: GridFile.BYTES or GridFile.NIBBLES
+        @return: The record as bytes
+        """
+        if encoding == GridFile.BYTES:
+            return bytes(values)
+        if len(values) % 2:
+            values = list(values) + [0]
+        return bytes((values[i] << 4) | values[i + 1] for i in range(0, len(values), 2))
+
+    @staticmethod
+    def write(filename, boards, box_size=3, packed=True):
+        """
+        Writes boards to a new archive as they come, so the boards can be a lazy iterable
+        @param boards: iterable of row-major value lists, all for the same box size
+        @param packed: two fields per byte, only possible when no value is above 15
+        @return: Number of boards written
+        """
+        size = box_size * box_size
+        cell_count = size * size
+        encoding = GridFile.NIBBLES if packed else GridFile.BYTES
+        assert not packed or size <= 15, f"Values of a {size}x{size} board do not fit in a nibble"
+        record_size = (cell_count + 1) // 2 if packed else cell_count
+        count = 0
+        with open(filename, "wb") as file:
+            file.write(GridFile.HEADER.pack(GridFile.MAGIC, GridFile.VERSION, box_size, encoding, record_size))
+            for values in boards:
+                if len(values) != cell_count:
+                    raise ValueError(f"Board {count} has {len(values)} fields, expected {cell_count}")
+                file.write(GridFile.encode(values, encoding))
+                count += 1
+        return count
+
+    @staticmethod
+    def parse_values(puzzle):
+        """
+        @param puzzle: a board in any format Sudoku.from_string reads
+        @return: Row-major list of its values, without building the fields of a Sudoku
+        """
+        return [Sudoku.parse_token(token) for row in Sudoku.split_rows(puzzle) for token in row]
+
+    @staticmethod
+    def from_text(text_file, grid_file, packed=None):
+        """
+        Converts a text file of puzzles, in any layout Batch.read_puzzles reads, to an archive
+        @param packed: None packs the boards when their values fit in a nibble
+        @return: Number of boards written
+        """
+        # Imported here, Batch reads archives through this module
+        from Batch import Batch
+        puzzles = (GridFile.parse_values(puzzle) for puzzle in Batch.read_puzzles(text_file))
+        first = next(puzzles, None)
+        if first is None:
+            return GridFile.write(grid_file, [], 3, packed is not False)
+        box_size = isqrt(isqrt(len(first)))
+        if packed is None:
+            packed = box_size * box_size <= 15
+
+        def boards():
+            yield first
+            yield from puzzles
+
+        return GridFile.write(grid_file, boards(), box_size, packed)
+
+    @staticmethod
+    def to_text(grid_file, text_file):
+        """
+        Converts an archive to a text file with one board per line and . for empty fields
+        @return: Number of boards written
+        """
+        with GridFile(grid_file) as grids, open(text_file, "w") as output:
+            for index in range(len(grids)):
+                output.write("".join(SYMBOLS[value] if value else "." for value in grids.values(index)) + "\n")
+            return len(grids)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert puzzles between text files and binary grid files")
+    parser.add_argument("input", help="text file of puzzles, or a grid file to convert back to text")
+    parser.add_argument("output")
+    parser.add_argument("--unpacked", action="store_true", help="store one byte per field instead of one nibble")
+    args = parser.parse_args()
+
+    if GridFile.is_grid_file(args.input):
+        count = GridFile.to_text(args.input, args.output)
+    else:
+        count = GridFile.from_text(args.input, args.output, False if args.unpacked else None)
+    print(f"Converted {count} boards")
@@ -0,0 +1,56 @@
+import os
+from collections import deque
+from itertools import islice
+
+
+def run_chunk(function, chunk, args):
+    """
+    Worker side of Parallel.ordered_map: apply the function to every item of one chunk
+    """
+    return [function(item, *args) for item in chunk]
+
+
+class Parallel:
+    """
+    Runs independent jobs on a pool of worker processes. Jobs are sent in chunks to keep the
+    inter-process overhead low, and results are yielded in the order of the input.
+    """
+
+    @staticmethod
+    def default_workers():
+        return os.cpu_count() or 1
+
+    @staticmethod
+    def ordered_map(function, items, workers=None, chunksize=64, args=()):
+        """
+        Lazily apply a function to every item, using several processes
+        @param function: module level function or static method taking (item, *args)
+        @param items: iterable of picklable items, for puzzles a compact string rather than a Sudoku
+        @param workers: number of worker processes, 1 runs everything in the current process
+        @param chunksize: number of items sent to a worker at once
+        @param args: extra arguments passed to every call
+        @return: Generator of results in the same order as the items
+        """
+        workers = workers or Parallel.default_workers()
+        items = iter(items)
+        if workers <= 1:
+            for item in items:
+                yield function(item, *args)
+            return
+
+        # At most two chunks per worker are in flight, so a lazy input is never read completely
+        # into memory and results can be handed out in order as soon as they are available
+        max_pending = 2 * workers
+        # Imported here because loading multiprocessing is a large part of the start-up time of a worker
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            while True:
+                while len(pending) < max_pending:
+                    chunk = list(islice(items, chunksize))
+                    if not chunk:
+                        break
+                    pending.append(executor.submit(run_chunk, function, chunk, args))
+                if not pending:
+                    break
+                yield from pending.popleft().result()
@@ -0,0 +1,195 @@
+import argparse
+import csv
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import nullcontext
+from Batch import Batch
+from Budget import Budget
+from Game import Game
+from Parallel import Parallel
+from Sudoku import Sudoku
+
+
+class Portfolio:
+    """
+    Races several solver configurations on the same puzzle in worker processes and keeps the first decisive
+    result: a valid solution, or a complete search proving that there is none. The other configurations are
+    then cancelled through an event shared with the workers, which their search checks like a Budget, and
+    configurations that did not start yet are dropped. The winning configuration is recorded, so a run shows
+    which configurations earn their place in the portfolio.
+    """
+
+    # (heuristic, use_backtracking, search, ordering) of the default portfolio, which configuration wins
+    # differs a lot from puzzle to puzzle
+    CONFIGURATIONS = (
+        ("default", True, "mac", "none"),
+        ("MRV", True, "forward_checking", "none"),
+        ("DLX", True, "plain", "none"),
+        ("Degree", True, "mac", "lcv"),
+        ("ConstraintPropagation", True, "plain", "none"),
+    )
+    STATS_FIELDS = ["index", "status", "winner", "time", "finished"]
+
+    # Cancel event of the portfolio in a worker process, set by attach when the worker starts
+    cancel_event = None
+
+    def __init__(self, configurations=None, workers=None, time_limit=None):
+        """
+        @param configurations: tuples of (heuristic, use_backtracking, search, ordering), see Game.solve
+        @param workers: number of worker processes, at most one per configuration. 1 tries the configurations
+        one after another in this process, which only makes sense for testing.
+        @param time_limit: seconds after which every configuration gives up, None for no limit
+        """
+        self.configurations = list(configurations or Portfolio.CONFIGURATIONS)
+        self.workers = min(workers or Parallel.default_workers(), len(self.configurations))
+        self.time_limit = time_limit
+        self.executor = None
+        self.event = None
+        self.wins = {Portfolio.name(configuration): 0 for configuration in self.configurations}
+
+    @staticmethod
+    def name(configuration):
+        heuristic, use_backtracking, search, ordering = configuration
+        if heuristic == "DLX":
+            return heuristic
+        if not use_backtracking:
+            return heuristic + "/ac3"
+        return f"{heuristic}/{search}" + (f"/{ordering}" if ordering != "none" else "")
+
+    @staticmethod
+    def attach(event):
+        """Initializer of the worker processes"""
+        Portfolio.cancel_event = event
+
+    @staticmethod
+    def run_configuration(puzzle, configuration, time_limit=None):
+        """
+        Worker side of the race, solves the puzzle with one configuration until it is done or cancelled
+        @return: Tuple of the configuration, its status, the resulting board on a single line and the time
+        """
+        start_time = time.perf_counter()
+        heuristic, use_backtracking, search, ordering = configuration
+        budget = Budget(time_limit=time_limit, cancel=Portfolio.cancel_event)
+        if Portfolio.cancel_event is not None and Portfolio.cancel_event.is_set():
+            return configuration, "cancelled", puzzle, 0.0
+        game = Game.from_string(puzzle, quiet=True)
+        stats = game.solve(heuristic, use_backtracking, search, ordering=ordering, budget=budget)
+        status = stats.status
+        if status == "solved" and not game.valid_solution():
+            status = "unsolved"
+        return configuration, status, game.sudoku.to_line(), time.perf_counter() - start_time
+
+    @staticmethod
+    def decisive(configuration, status) -> bool:
+        """A solution decides the race, and so does a complete search that found none"""
+        return status == "solved" or (status == "unsolved" and configuration[1])
+
+    def start(self):
+        """Starts the worker processes, solve starts them on first use"""
+        if self.workers <= 1 or self.executor is not None:
+            return
+        context = multiprocessing.get_context()
+        self.event = context.Event()
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=context,
+                                            initializer=Portfolio.attach, initargs=(self.event,))
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def solve(self, puzzle):
+        """
+        Races the configurations on one puzzle
+        @param puzzle: the puzzle in a format Sudoku.from_string reads
+        @return: Dict with the status of the race (solved, unsolved or budget_exceeded), the winning configuration
+        by name or None, the resulting board on a single line, the time until the result and the status of every
+        configuration that finished before the others were cancelled
+        """
+        start_time = time.perf_counter()
+        finished = {}
+        winner = None
+        # Board of the last configuration that finished, the result when no configuration decides the race
+        line = None
+        if self.workers <= 1:
+            for configuration in self.configurations:
+                configuration, status, line, _ = Portfolio.run_configuration(puzzle, configuration, self.time_limit)
+                finished[Portfolio.name(configuration)] = status
+                if Portfolio.decisive(configuration, status):
+                    winner = configuration, status, line
+                    break
+        else:
+            self.start()
+            self.event.clear()
+            # Submitted in the order of the configurations, which start first when there are fewer workers
+            pending = set([self.executor.submit(Portfolio.run_configuration, puzzle, configuration, self.time_limit)
+                           for configuration in self.configurations])
+            while pending and winner is None:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    configuration, status, line, _ = future.result()
+                    finished[Portfolio.name(configuration)] = status
+                    if winner is None and Portfolio.decisive(configuration, status):
+                        winner = configuration, status, line
+            # Stop the others before the next race reuses the workers
+            self.event.set()
+            for future in pending:
+                future.cancel()
+            wait(pending)
+
+        elapsed = time.perf_counter() - start_time
+        if winner is None:
+            status = "budget_exceeded" if "budget_exceeded" in finished.values() else "unsolved"
+            if line is None:
+                line = Sudoku.from_string(puzzle).to_line()
+            return {"status": status, "winner": None, "solution": line, "time": elapsed, "finished": finished}
+        configuration, status, line = winner
+        name = Portfolio.name(configuration)
+        self.wins[name] += 1
+        return {"status": status, "winner": name, "solution": line, "time": elapsed, "finished": finished}
+
+    def solve_file(self, input_file, output_file, stats_file=None):
+        """
+        Races the configurations on every puzzle of a file, one puzzle after another
+        @param stats_file: optional CSV file with the winner and time of every puzzle
+        @return: Dict of the number of wins of every configuration
+        """
+        stats_context = open(stats_file, "w", newline="") if stats_file else nullcontext()
+        with self, open(output_file, "w") as output, stats_context as stats_output:
+            stats_writer = None
+            if stats_output is not None:
+                stats_writer = csv.DictWriter(stats_output, fieldnames=Portfolio.STATS_FIELDS)
+                stats_writer.writeheader()
+            for index, puzzle in enumerate(Batch.read_puzzles(input_file)):
+                result = self.solve(puzzle)
+                output.write(result["solution"] + "\n")
+                if stats_writer is not None:
+                    stats_writer.writerow({
+                        "index": index,
+                        "status": result["status"],
+                        "winner": result["winner"],
+                        "time": result["time"],
+                        "finished": " ".join(f"{name}:{status}" for name, status in result["finished"].items())
+                    })
+        return dict(self.wins)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve every puzzle of a file by racing several configurations")
+    parser.add_argument("input", help="puzzle file, one puzzle per line or one row per line")
+    parser.add_argument("output", help="file to write the solved boards to")
+    parser.add_argument("--stats", help="CSV file to write the winner of every puzzle to")
+    parser.add_argument("--workers", type=int, default=0, help="number of worker processes, 0 uses all cores")
+    parser.add_argument("--time-limit", type=float, help="give up on a puzzle after this many seconds")
+    args = parser.parse_args()
+
+    wins = Portfolio(workers=args.workers, time_limit=args.time_limit).solve_file(args.input, args.output, args.stats)
+    print("Wins: " + ", ".join(f"{name} {count}" for name, count in wins.items()))
@@ -0,0 +1,78 @@
+import os
+import matplotlib.pyplot as plt
+import pandas as pd
+
+
+class Report:
+    """
+    Reporting and plotting of study results. This is the only module that imports pandas and
+    matplotlib, and it is only imported when a report is requested, so solving stays cheap to start.
+    """
+
+    @staticmethod
+    def generate_report(results):
+        df = pd.DataFrame(results)
+
+        # Value orderings only differ for backtracking search, they get their own table
+        print("\n=== Value Ordering ===")
+        print(df[df['Backtracking']].groupby(['Heuristic', 'Ordering']).agg({
+            'Solved': 'mean',
+            'Time': 'mean',
+            'Iterations': 'mean'
+        }))
+        df = df[df['Ordering'] == 'none']
+
+        # Print summary table
+        print("\n=== Summary Table ===")
+        print(df.groupby(['Heuristic', 'Backtracking']).agg({
+            'Solved': 'mean',
+            'Time': 'mean',
+            'Iterations': 'mean'
+        }))
+
+        # Plotting
+        fig, ax = plt.subplots(2, 1, figsize=(12, 10))
+
+        # Time plot
+        df.groupby(['Heuristic', 'Backtracking'])['Time'].mean().unstack().plot(
+            kind='bar',
+            ax=ax[0],
+            title='Average Solving Time by Heuristic'
+        )
+        ax[0].tick_params(axis='x', rotation=0)  # <-- Rotate labels horizontally
+
+
+        # Iterations plot
+        df.groupby(['Heuristic', 'Backtracking'])['Iterations'].mean().unstack().plot(
+            kind='bar',
+            ax=ax[1],
+            title='Average Iterations by Heuristic'
+        )
+        ax[1].tick_params(axis='x', rotation=0)  # <-- Rotate labels horizontally
+
+
+        plt.tight_layout()
+        save_path = os.path.join(os.getcwd(), 'complexity_report.png')
+        plt.savefig('complexity_report.png')
+        print(f"Graph saved successfully at: {save_path}")  # Confirm save location
+        plt.show()
+        plt.close()
+
+    @staticmethod
+    def plot_results(results, heuristics):
+        """Plots a graph comparing heuristic performance."""
+        difficulties = list(set(result["puzzle"] for result in results))
+
+        plt.figure(figsize=(10, 5))
+
+        for heuristic in heuristics:
+            times = [result["time"] for result in results if result["heuristic"] == heuristic]
+            plt.plot(difficulties, times, label=heuristic, marker='o')
+
+        plt.xlabel("Sudoku Puzzle")
+        plt.ylabel("Time (seconds)")
+        plt.title("Sudoku Solving Time Comparison")
+        plt.legend()
+        plt.xticks(rotation=45)
+        plt.grid()
+        plt.show()
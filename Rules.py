@@ -0,0 +1,251 @@
+from Domain import full_mask
+
+
+class Rule:
+    """
+    An inference rule that reasons about whole units, on top of the arc consistency of AC-3. Rules
+    only read the current values and domains of a Game and shrink domains through Game.restrict.
+    Every deduction that changes at least one domain counts as a hit.
+    """
+
+    name = "Rule"
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.hits = 0
+
+    def apply(self, game) -> bool:
+        """
+        Applies the rule once to every unit of the board
+        @param game: the Game whose domains are reduced
+        @return: false if a contradiction was found
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def placed_mask(values, cells):
+        """Mask of the values already assigned to the given fields"""
+        placed = 0
+        for cell in cells:
+            if values[cell]:
+                placed |= 1 << (values[cell] - 1)
+        return placed
+
+    def eliminate(self, game, cells, keep, value_bit) -> bool:
+        """
+        Removes a value from the unassigned fields of cells that are not in keep, counting one hit if anything changed
+        @return: false if a domain became empty
+        """
+        values = game.values
+        domains = game.domains
+        changed = False
+        for cell in cells:
+            if values[cell] == 0 and domains[cell] & value_bit and cell not in keep:
+                changed = True
+                if not game.restrict(cell, domains[cell] & ~value_bit):
+                    return False
+        self.hits += changed
+        return True
+
+
+class HiddenSingles(Rule):
+    """A value that fits in only one field of a unit is assigned to that field"""
+
+    name = "HiddenSingles"
+
+    def apply(self, game) -> bool:
+        values = game.values
+        domains = game.domains
+        full = full_mask(game.topology.size)
+        for unit in game.topology.units:
+            placed = once = twice = 0
+            for cell in unit:
+                value = values[cell]
+                if value:
+                    placed |= 1 << (value - 1)
+                else:
+                    mask = domains[cell]
+                    twice |= once & mask
+                    once |= mask
+            if once | placed != full:
+                return False  # A value has no field left in this unit
+
+            singles = once & ~twice & ~placed
+            while singles:
+                value_bit = singles & -singles
+                singles ^= value_bit
+                for cell in unit:
+                    if values[cell] == 0 and domains[cell] & value_bit:
+                        self.hits += 1
+                        game.restrict(cell, value_bit)
+                        break
+        return True
+
+
+class NakedPairs(Rule):
+    """Two fields of a unit with the same two-value domain take both values, so no other field of the unit can"""
+
+    name = "NakedPairs"
+
+    def apply(self, game) -> bool:
+        values = game.values
+        domains = game.domains
+        for unit in game.topology.units:
+            pairs = {}
+            for cell in unit:
+                mask = domains[cell]
+                if values[cell] == 0 and mask.bit_count() == 2:
+                    other = pairs.setdefault(mask, cell)
+                    if other != cell:
+                        while mask:
+                            value_bit = mask & -mask
+                            mask ^= value_bit
+                            if not self.eliminate(game, unit, (cell, other), value_bit):
+                                return False
+        return True
+
+
+class HiddenPairs(Rule):
+    """Two values that fit in the same two fields of a unit, and nowhere else, leave no room for other values in those fields"""
+
+    name = "HiddenPairs"
+
+    def apply(self, game) -> bool:
+        values = game.values
+        domains = game.domains
+        for unit in game.topology.units:
+            placed = once = twice = thrice = 0
+            for cell in unit:
+                value = values[cell]
+                if value:
+                    placed |= 1 << (value - 1)
+                else:
+                    mask = domains[cell]
+                    thrice |= twice & mask
+                    twice |= once & mask
+                    once |= mask
+            # Values with exactly two possible fields. A value assigned by an earlier rule can still be in the
+            # domains of its neighbours until AC-3 runs again, so assigned values are left out.
+            candidates = twice & ~thrice & ~placed
+
+            # Group the candidate values by the pair of fields they fit in
+            pairs = {}
+            while candidates:
+                value_bit = candidates & -candidates
+                candidates ^= value_bit
+                cells = tuple(cell for cell in unit if values[cell] == 0 and domains[cell] & value_bit)
+                pairs[cells] = pairs.get(cells, 0) | value_bit
+
+            for cells, pair in pairs.items():
+                if pair.bit_count() != 2:
+                    continue
+                changed = False
+                for cell in cells:
+                    if domains[cell] != pair:
+                        changed = True
+                        if not game.restrict(cell, domains[cell] & pair):
+                            return False
+                self.hits += changed
+        return True
+
+
+class PointingPairs(Rule):
+    """When the fields of a box that can hold a value all lie in one row or column, the rest of that line cannot hold it"""
+
+    name = "PointingPairs"
+
+    def apply(self, game) -> bool:
+        topology = game.topology
+        for box_number, box in enumerate(topology.boxes):
+            placed = self.placed_mask(game.values, box)
+            for segments in (topology.box_rows[box_number], topology.box_columns[box_number]):
+                if not self.reduce(game, segments, placed):
+                    return False
+        return True
+
+    def reduce(self, game, segments, placed) -> bool:
+        """
+        Finds values that fit in exactly one of the segments and removes them from the rest of the unit of that segment
+        @param segments: (unit, cells) pairs that together cover one unit
+        @param placed: values already assigned in the covered unit
+        """
+        values = game.values
+        domains = game.domains
+        units = game.topology.units
+        segment_masks = []
+        once = twice = 0
+        for unit, cells in segments:
+            mask = 0
+            for cell in cells:
+                if values[cell] == 0:
+                    mask |= domains[cell]
+            segment_masks.append(mask)
+            twice |= once & mask
+            once |= mask
+
+        confined = once & ~twice & ~placed
+        while confined:
+            value_bit = confined & -confined
+            confined ^= value_bit
+            for (unit, cells), mask in zip(segments, segment_masks):
+                if mask & value_bit:
+                    if not self.eliminate(game, units[unit], cells, value_bit):
+                        return False
+                    break
+        return True
+
+
+class BoxLineReduction(PointingPairs):
+    """When the fields of a row or column that can hold a value all lie in one box, the rest of that box cannot hold it"""
+
+    name = "BoxLineReduction"
+
+    def apply(self, game) -> bool:
+        topology = game.topology
+        for line, segments in enumerate(topology.line_boxes):
+            placed = self.placed_mask(game.values, topology.units[line])
+            if not self.reduce(game, segments, placed):
+                return False
+        return True
+
+
+class Propagator:
+    """
+    Pipeline of inference rules that Game.solve alternates with AC-3 until neither changes a domain.
+    Each rule can be switched on or off and counts its own hits.
+    """
+
+    RULES = [HiddenSingles, NakedPairs, HiddenPairs, PointingPairs, BoxLineReduction]
+    RULE_NAMES = [rule.name for rule in RULES]
+
+    def __init__(self, names=None):
+        """
+        @param names: names of the rules to enable, None enables all rules
+        """
+        for name in names or []:
+            assert name in Propagator.RULE_NAMES, "Unknown rule: " + name
+        self.rules = [rule(names is None or rule.name in names) for rule in Propagator.RULES]
+
+    def set_enabled(self, name, enabled=True):
+        for rule in self.rules:
+            if rule.name == name:
+                rule.enabled = enabled
+
+    def apply(self, game) -> bool:
+        """
+        Applies every enabled rule once
+        @return: false if a contradiction was found
+        """
+        for rule in self.rules:
+            if rule.enabled and not rule.apply(game):
+                return False
+        return True
+
+    def hits(self):
+        """
+        @return: Dict of rule name to its number of hits
+        """
+        return {rule.name: rule.hits for rule in self.rules}
+
+    def total_hits(self):
+        return sum(rule.hits for rule in self.rules)
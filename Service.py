@@ -0,0 +1,273 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from Batch import Batch
+from Game import Game
+from Parallel import Parallel, run_chunk
+from Rules import Propagator
+
+
+class Service:
+    """
+    Solving service speaking a line protocol over TCP or a Unix socket. Every request line is a puzzle on
+    a single line, and is answered in the order of the requests of its connection with one of
+    SOLVED <board>, UNSOLVED <board>, TIMEOUT or ERROR <message>. The line STATS is answered with the
+    stats of the service as JSON.
+
+    Requests of all connections are queued and grouped into micro-batches, which are solved on a pool of
+    worker processes, so the event loop never runs a solver and a burst of requests costs one round trip
+    to a worker per batch instead of one per puzzle. Every request has a deadline: requests that expire
+    while queued are dropped before they reach a worker, the search of a request stops at its deadline,
+    and a request whose batch is still running when its deadline passes is answered with TIMEOUT.
+    """
+
+    # Number of recent requests the latency percentiles are computed from
+    LATENCY_WINDOW = 10000
+
+    def __init__(self, workers=None, batch_size=32, max_wait=0.005, timeout=1.0, heuristic="default",
+                 use_backtracking=True, search="mac", rules=None):
+        """
+        @param workers: number of worker processes, which is also the number of batches solved at once
+        @param batch_size: maximum number of puzzles in a batch
+        @param max_wait: seconds a batch waits for more puzzles after its first one
+        @param timeout: seconds from receiving a request to its deadline
+        @param heuristic, use_backtracking, search, rules: settings of Game.solve for every puzzle
+        """
+        self.workers = workers or Parallel.default_workers()
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self.settings = (heuristic, use_backtracking, search, rules)
+        self.queue = None
+        self.executor = None
+        self.requests = 0
+        self.solved = 0
+        self.unsolved = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.batches = 0
+        self.batched = 0
+        self.max_queue_depth = 0
+        self.latencies = deque(maxlen=Service.LATENCY_WINDOW)
+
+    @staticmethod
+    def solve_request(request, heuristic, use_backtracking, search, rules):
+        """
+        Worker side of a request
+        @param request: tuple of the puzzle and its deadline in time.time() seconds
+        @return: The response line without its newline
+        """
+        puzzle, deadline = request
+        # The puzzles of a batch are solved one after another, so the time left is known only now
+        time_left = deadline - time.time()
+        if time_left <= 0:
+            return "TIMEOUT"
+        try:
+            line, stats = Batch.solve_puzzle(puzzle, heuristic, use_backtracking, search, rules,
+                                             limits=(None, time_left))
+        except (ValueError, AssertionError, IndexError) as error:
+            return f"ERROR {Service.one_line(error) or 'invalid puzzle'}"
+        if stats["status"] in ("budget_exceeded", "cancelled"):
+            return "TIMEOUT"
+        return ("SOLVED " if stats["solved"] else "UNSOLVED ") + line
+
+    @staticmethod
+    def one_line(error):
+        """The message of an exception on a single line, so it cannot break the protocol"""
+        return " ".join(str(error).split())
+
+    async def submit(self, puzzle):
+        """
+        Queues a puzzle and waits for its result until the deadline of the request
+        @return: The response line without its newline
+        """
+        self.requests += 1
+        start = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((puzzle, future, start + self.timeout))
+        self.max_queue_depth = max(self.max_queue_depth, self.queue.qsize())
+        try:
+            response = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            response = "TIMEOUT"
+        self.latencies.append(time.perf_counter() - start)
+        if response.startswith("SOLVED"):
+            self.solved += 1
+        elif response.startswith("UNSOLVED"):
+            self.unsolved += 1
+        elif response == "TIMEOUT":
+            self.timeouts += 1
+        else:
+            self.errors += 1
+        return response
+
+    async def next_batch(self):
+        """
+        Waits for a puzzle, then collects more until the batch is full or max_wait has passed. Requests whose
+        deadline passed while they were queued are answered here and not solved.
+        @return: List of (puzzle, future, deadline) of the batch, never empty
+        """
+        batch = []
+        limit = None
+        while len(batch) < self.batch_size:
+            if limit is None:
+                request = await self.queue.get()
+            else:
+                remaining = limit - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    request = await asyncio.wait_for(self.queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            puzzle, future, deadline = request
+            if future.done():
+                continue
+            if time.perf_counter() >= deadline:
+                future.set_result("TIMEOUT")
+                continue
+            batch.append(request)
+            if limit is None:
+                limit = time.perf_counter() + self.max_wait
+        return batch
+
+    async def dispatch(self):
+        """Sends batches to the workers, with at most one batch per worker in flight"""
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.workers)
+
+        async def run(batch):
+            try:
+                # Deadlines are sent on the wall clock, perf_counter of the workers may have another origin
+                offset = time.time() - time.perf_counter()
+                requests = [(puzzle, deadline + offset) for puzzle, _, deadline in batch]
+                results = await loop.run_in_executor(self.executor, run_chunk, Service.solve_request, requests,
+                                                     self.settings)
+            except Exception as error:
+                results = [f"ERROR {Service.one_line(error)}"] * len(batch)
+            finally:
+                slots.release()
+            for (_, future, _), response in zip(batch, results):
+                if not future.done():
+                    future.set_result(response)
+
+        while True:
+            await slots.acquire()
+            batch = await self.next_batch()
+            self.batches += 1
+            self.batched += len(batch)
+            asyncio.create_task(run(batch))
+
+    async def handle(self, reader, writer):
+        """Serves one connection, requests may be pipelined and are answered in order"""
+        # Pending requests of the connection in order, STATS is answered when its turn comes
+        responses = asyncio.Queue()
+
+        async def respond():
+            while True:
+                response = await responses.get()
+                if response is None:
+                    break
+                response = json.dumps(self.stats()) if response == "STATS" else await response
+                writer.write(response.encode() + b"\n")
+                await writer.drain()
+
+        responder = asyncio.create_task(respond())
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                line = line.decode().strip()
+                if line.upper() == "STATS":
+                    await responses.put("STATS")
+                elif line:
+                    await responses.put(asyncio.ensure_future(self.submit(line)))
+            await responses.put(None)
+            await responder
+        except ConnectionError:
+            pass
+        finally:
+            responder.cancel()
+            writer.close()
+
+    def stats(self):
+        """
+        @return: Dict of the request counters, the queue depth and the latency percentiles in milliseconds
+        """
+        latencies = sorted(self.latencies)
+
+        def percentile(fraction):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000
+
+        return {
+            "requests": self.requests,
+            "solved": self.solved,
+            "unsolved": self.unsolved,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "batches": self.batches,
+            "mean_batch_size": self.batched / self.batches if self.batches else 0.0,
+            "latency_p50_ms": percentile(0.5),
+            "latency_p90_ms": percentile(0.9),
+            "latency_p99_ms": percentile(0.99)
+        }
+
+    async def serve(self, host="127.0.0.1", port=8765, path=None, ready=None):
+        """
+        Runs the service until it is cancelled
+        @param path: Unix socket to listen on instead of host and port
+        @param ready: optional callback with the asyncio server once it accepts connections
+        """
+        self.queue = asyncio.Queue()
+        # Forked workers would inherit the sockets of open connections and keep them open after they are closed
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context) as executor:
+            self.executor = executor
+            # Start every worker before the first request, so no request waits for a process to start
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(loop.run_in_executor(executor, os.getpid) for _ in range(self.workers)))
+            if path is not None:
+                server = await asyncio.start_unix_server(self.handle, path)
+            else:
+                server = await asyncio.start_server(self.handle, host, port)
+            dispatcher = asyncio.create_task(self.dispatch())
+            try:
+                async with server:
+                    if ready is not None:
+                        ready(server)
+                    await server.serve_forever()
+            finally:
+                dispatcher.cancel()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the solver over a line protocol, one puzzle per line")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="Unix socket to listen on instead of a TCP port")
+    parser.add_argument("--workers", type=int, default=0, help="number of worker processes, 0 uses all cores")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-wait", type=float, default=0.005, help="seconds a batch waits to fill up")
+    parser.add_argument("--timeout", type=float, default=1.0, help="deadline of every request in seconds")
+    parser.add_argument("--heuristic", default="default", choices=Game.HEURISTICS + ("auto",))
+    parser.add_argument("--search", default="mac", choices=Game.SEARCH_MODES)
+    parser.add_argument("--rules", nargs="+", choices=Propagator.RULE_NAMES, help="inference rules to run with AC-3, see Rules.Propagator")
+    args = parser.parse_args()
+
+    service = Service(args.workers, args.batch_size, args.max_wait, args.timeout, args.heuristic, True, args.search,
+                      args.rules)
+    try:
+        asyncio.run(service.serve(args.host, args.port, args.unix,
+                                  lambda server: print(f"Listening on {args.unix or f'{args.host}:{args.port}'}")))
+    except KeyboardInterrupt:
+        pass
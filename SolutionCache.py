@@ -0,0 +1,237 @@
+from collections import OrderedDict
+from Domain import SYMBOLS
+
+
+class SolutionCache:
+    """
+    Bounded LRU cache of solved puzzles in front of Game.solve, with an optional persistent tier in SQLite.
+
+    Puzzles are stored under a canonical form, so a puzzle that is a relabelling of the digits, a permutation
+    of rows within bands, of bands, of columns within stacks, of stacks, or a transposition of a cached puzzle
+    is a hit as well. The canonical form orders rows and columns by their number of givens and their pattern
+    of givens, and relabels the digits in order of appearance. Ties keep the original order, so not every pair
+    of equivalent puzzles meets in the same form, but every form is reached through a valid symmetry of the
+    board, so the solution stored for it is mapped back through the inverse transformation.
+    """
+
+    # Caches shared by all solves in one process, keyed by (capacity, path)
+    _shared = {}
+
+    def __init__(self, capacity=10000, path=None):
+        """
+        @param capacity: maximum number of solutions kept in memory
+        @param path: SQLite file for the persistent tier, None keeps the cache in memory only
+        """
+        self.capacity = capacity
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.connection = None
+        if path is not None:
+            # Imported here so that a cache in memory never loads sqlite3
+            import sqlite3
+            self.connection = sqlite3.connect(path, timeout=30)
+            with self.connection:
+                self.connection.execute("CREATE TABLE IF NOT EXISTS solutions (key TEXT PRIMARY KEY, solution TEXT)")
+
+    @staticmethod
+    def shared(capacity=10000, path=None):
+        """The cache of this process for the given settings, so that worker processes each keep their own"""
+        cache = SolutionCache._shared.get((capacity, path))
+        if cache is None:
+            cache = SolutionCache._shared[(capacity, path)] = SolutionCache(capacity, path)
+        return cache
+
+    def solve(self, game, heuristic="default", use_backtracking=False, search="plain", rules=None, ordering="none",
+              budget=None):
+        """
+        Game.solve with the cache in front of it. On a hit the solution is written to the board without
+        solving, and the iteration counters of the game stay 0.
+        @return: The SolveStats of the game, true if the puzzle was solved
+        """
+        topology = game.topology
+        key, transform = SolutionCache.canonical_form(game.values, topology)
+        solution = self.get(key)
+        if solution is not None:
+            game.ac3_iterations = 0
+            game.backtrack_iterations = 0
+            values = SolutionCache.restore(solution, transform, topology)
+            for index, value in enumerate(values):
+                if not game.values[index]:
+                    game.place(index, value)
+                game.domains[index] = 1 << (value - 1)
+            game.solutions = [game.sudoku.to_line()]
+            game.stats.reset()
+            game.stats.solved = True
+            game.stats.status = "solved"
+            return game.stats
+
+        solved = game.solve(heuristic, use_backtracking, search, rules, ordering=ordering, budget=budget)
+        if solved and game.is_complete(None):
+            canonical = SolutionCache.apply(game.values, transform, topology)
+            self.put(key, "".join(SYMBOLS[value] for value in canonical))
+        return solved
+
+    def get(self, key):
+        """
+        @param key: canonical form of a puzzle
+        @return: The solution of the canonical form on a single line, None if it is not cached
+        """
+        solution = self.entries.get(key)
+        if solution is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return solution
+        if self.connection is not None:
+            row = self.connection.execute("SELECT solution FROM solutions WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                self.disk_hits += 1
+                self.remember(key, row[0])
+                return row[0]
+        self.misses += 1
+        return None
+
+    def put(self, key, solution):
+        self.remember(key, solution)
+        if self.connection is not None:
+            with self.connection:
+                self.connection.execute("INSERT OR REPLACE INTO solutions VALUES (?, ?)", (key, solution))
+
+    def remember(self, key, solution):
+        """Adds an entry to the memory tier, evicting the least recently used entry when it is full"""
+        self.entries[key] = solution
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.capacity:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        """
+        @return: Dict of the counters and the number of entries in memory
+        """
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self.entries)
+        }
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    @staticmethod
+    def canonical_form(values, topology):
+        """
+        @param values: row-major list of values, 0 for empty fields
+        @param topology: Topology of the board
+        @return: Tuple of the canonical form on a single line and the transformation that leads to it
+        """
+        size = topology.size
+        grid = [values[row * size:(row + 1) * size] for row in range(size)]
+        transposed = [list(column) for column in zip(*grid)]
+        candidates = []
+        for is_transposed, rows in ((False, grid), (True, transposed)):
+            row_order, column_order = SolutionCache.order_lines(rows, topology.box_size)
+            relabel = SolutionCache.relabel(rows, row_order, column_order, size)
+            transform = (is_transposed, row_order, column_order, relabel)
+            canonical = SolutionCache.apply(values, transform, topology)
+            candidates.append(("".join(SYMBOLS[value] for value in canonical), transform))
+        return min(candidates, key=lambda candidate: candidate[0])
+
+    @staticmethod
+    def order_lines(rows, box_size):
+        """
+        Orders bands and rows, then stacks and columns, by their number of givens, and then once more by the
+        pattern of givens under the order of the other direction. Only permutations that keep a valid board are
+        used: bands as a whole and rows within their band, the same for stacks and columns.
+        @return: Tuple of the original row index of every canonical row and the same for the columns
+        """
+        columns = [list(column) for column in zip(*rows)]
+        row_keys = [(sum(1 for value in row if value),) for row in rows]
+        column_keys = [(sum(1 for value in column if value),) for column in columns]
+        row_order = SolutionCache.order_blocks(row_keys, box_size)
+        column_order = SolutionCache.order_blocks(column_keys, box_size)
+
+        # Refine each direction with its pattern of givens in the order of the other direction
+        row_keys = [key + (tuple(1 if rows[row][column] else 0 for column in column_order),)
+                    for row, key in enumerate(row_keys)]
+        row_order = SolutionCache.order_blocks(row_keys, box_size)
+        column_keys = [key + (tuple(1 if rows[row][column] else 0 for row in row_order),)
+                       for column, key in enumerate(column_keys)]
+        column_order = SolutionCache.order_blocks(column_keys, box_size)
+        return row_order, column_order
+
+    @staticmethod
+    def order_blocks(keys, box_size):
+        """
+        Sorts the lines of every block by key, most givens first, and then the blocks by their sorted keys
+        @param keys: comparable key of every line
+        @return: List of the original line indices in the new order
+        """
+        blocks = []
+        for start in range(0, len(keys), box_size):
+            blocks.append(sorted(range(start, start + box_size), key=lambda line: keys[line], reverse=True))
+        blocks.sort(key=lambda block: [keys[line] for line in block], reverse=True)
+        return [line for block in blocks for line in block]
+
+    @staticmethod
+    def relabel(rows, row_order, column_order, size):
+        """
+        Numbers the digits in order of first appearance when reading the reordered board, digits that do not
+        appear get the remaining labels in increasing order
+        @return: List mapping every original value to its canonical value, 0 stays 0
+        """
+        relabel = [0] * (size + 1)
+        label = 0
+        for row in row_order:
+            for column in column_order:
+                value = rows[row][column]
+                if value and not relabel[value]:
+                    label += 1
+                    relabel[value] = label
+        for value in range(1, size + 1):
+            if not relabel[value]:
+                label += 1
+                relabel[value] = label
+        return relabel
+
+    @staticmethod
+    def apply(values, transform, topology):
+        """
+        @param values: row-major list of values of the original board
+        @return: Row-major list of the values after the transformation
+        """
+        is_transposed, row_order, column_order, relabel = transform
+        size = topology.size
+        if is_transposed:
+            return [relabel[values[column * size + row]] for row in row_order for column in column_order]
+        return [relabel[values[row * size + column]] for row in row_order for column in column_order]
+
+    @staticmethod
+    def restore(line, transform, topology):
+        """
+        Maps a board in canonical form back through the inverse of the transformation
+        @param line: the transformed board on a single line
+        @return: Row-major list of values of the original board
+        """
+        is_transposed, row_order, column_order, relabel = transform
+        size = topology.size
+        inverse = [0] * (size + 1)
+        for value, label in enumerate(relabel):
+            inverse[label] = value
+        values = [0] * topology.cell_count
+        position = 0
+        for row in row_order:
+            for column in column_order:
+                value = inverse[int(line[position], 36)]
+                if is_transposed:
+                    values[column * size + row] = value
+                else:
+                    values[row * size + column] = value
+                position += 1
+        return values
@@ -0,0 +1,89 @@
+import time
+from contextlib import contextmanager
+
+
+class SolveStats:
+    """
+    Measurements of one solve, returned by Game.solve. It is true when the puzzle was solved, so code that
+    only checks the result of solve keeps working, and status tells an unsolvable puzzle from a search that
+    ran out of its budget. Wall and CPU time are recorded per phase; the counters
+    are only updated where the solver already does the corresponding work, so measuring stays cheap.
+    """
+
+    PHASES = ("parse", "model", "queue", "ac3", "rules", "search", "validation")
+    STATUSES = ("solved", "unsolved", "budget_exceeded", "cancelled")
+    COUNTERS = ("revisions", "reductions", "nodes", "backtracks", "max_depth", "queue_high_water")
+    # Flat field names of as_dict, e.g. for a CSV header
+    FIELDS = ["status"] + list(COUNTERS) + [f"{phase}_{clock}" for phase in PHASES for clock in ("wall", "cpu")]
+
+    def __init__(self, hooks=None):
+        """
+        @param hooks: optional dict of callbacks by event name:
+        "phase" (name, wall seconds, cpu seconds) at the end of every phase,
+        "node" (depth, field index, value) for every assignment of the search that survives propagation,
+        "backtrack" (depth) whenever every value of a field failed,
+        "solution" (number of solutions found so far) for every solution of the search
+        """
+        self.hooks = hooks or {}
+        self.wall = {}
+        self.cpu = {}
+        self.reset()
+
+    def reset(self):
+        """Clears the measurements of a previous solve, the parse time of the board is kept"""
+        self.solved = False
+        # One of STATUSES, and for budget_exceeded which limit was hit, see Budget.REASONS
+        self.status = "unsolved"
+        self.budget_reason = None
+        self.revisions = 0
+        self.reductions = 0
+        self.nodes = 0
+        self.backtracks = 0
+        self.max_depth = 0
+        self.queue_high_water = 0
+        self.wall = {name: value for name, value in self.wall.items() if name == "parse"}
+        self.cpu = {name: value for name, value in self.cpu.items() if name == "parse"}
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Adds the wall and CPU time of the enclosed block to a phase, a phase may be entered several times
+        @param name: one of PHASES
+        """
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            self.wall[name] = self.wall.get(name, 0.0) + wall
+            self.cpu[name] = self.cpu.get(name, 0.0) + cpu
+            hook = self.hooks.get("phase")
+            if hook:
+                hook(name, wall, cpu)
+
+    def total_wall(self):
+        return sum(self.wall.values())
+
+    def total_cpu(self):
+        return sum(self.cpu.values())
+
+    def as_dict(self):
+        """
+        @return: Dict with an entry for every name in FIELDS, phases that did not run count as 0
+        """
+        result = {"status": self.status}
+        result.update((name, getattr(self, name)) for name in SolveStats.COUNTERS)
+        for phase in SolveStats.PHASES:
+            result[phase + "_wall"] = self.wall.get(phase, 0.0)
+            result[phase + "_cpu"] = self.cpu.get(phase, 0.0)
+        return result
+
+    def __bool__(self):
+        return self.solved
+
+    def __repr__(self):
+        phases = ", ".join(f"{name} {self.wall[name] * 1000:.2f} ms" for name in SolveStats.PHASES if name in self.wall)
+        counters = ", ".join(f"{name} {getattr(self, name)}" for name in SolveStats.COUNTERS)
+        return f"SolveStats({self.status}, {counters}, {phases})"
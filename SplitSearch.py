@@ -0,0 +1,209 @@
+import argparse
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from Batch import Batch
+from Budget import Budget
+from Domain import SYMBOLS, mask_values
+from Game import Game
+from Parallel import Parallel
+
+
+class SplitSearch:
+    """
+    Parallel search for a single hard puzzle. The search tree is split at shallow depth into subproblems, each
+    a partial assignment written as a board on a single line, and the subproblems are solved on a pool of
+    worker processes. A worker searches its subproblem with a node budget; when the budget runs out it splits
+    the subproblem once more and hands the parts back, so a subtree that turns out to be large is spread over
+    all workers instead of keeping one busy while the others idle. Subproblems wait on a stack and are
+    handed out depth first, a few per worker at a time.
+
+    In search mode the first solution wins and the other workers are cancelled. In counting mode the
+    solutions of all subproblems are added up until the limit is reached.
+    """
+
+    # Subproblems per worker the tree is split into before the workers start
+    SUBPROBLEMS_PER_WORKER = 4
+    # Search nodes a worker spends on a subproblem before it splits it
+    MAX_NODES = 2000
+    # Cancel event of the search in a worker process, set by attach when the worker starts
+    cancel_event = None
+
+    def __init__(self, workers=None, max_nodes=MAX_NODES, heuristic="default", search="mac"):
+        """
+        @param workers: number of worker processes, 1 solves the subproblems one after another in this process
+        @param max_nodes: search nodes spent on a subproblem before it is split again
+        @param heuristic, search: configuration of Game.solve for the subproblems, DLX cannot be split
+        """
+        assert heuristic != "DLX", "DLX searches its own exact cover matrix, its tree cannot be split"
+        self.workers = workers or Parallel.default_workers()
+        self.max_nodes = max_nodes
+        self.heuristic = heuristic
+        self.search = search
+
+    @staticmethod
+    def attach(event):
+        """Initializer of the worker processes"""
+        SplitSearch.cancel_event = event
+
+    @staticmethod
+    def split(line, heuristic="default"):
+        """
+        Propagates a subproblem and splits it on the values of the field with the fewest candidates
+        @param line: the subproblem as a board on a single line
+        @return: Tuple of the solution if propagation alone solved it, else None, and the list of child subproblems
+        """
+        game = Game.from_string(line, quiet=True)
+        game.solve(heuristic, False)
+        values = game.values
+        domains = game.domains
+        open_fields = [index for index, value in enumerate(values) if not value]
+        if not game.givens_consistent() or any(not domains[index] for index in open_fields):
+            return None, []  # The assignment of the subproblem contradicts itself
+        if not open_fields:
+            return game.sudoku.to_line(), []
+        var = min(open_fields, key=lambda index: domains[index].bit_count())
+        board = list(game.sudoku.to_line())
+        children = []
+        for value in mask_values(domains[var]):
+            board[var] = SYMBOLS[value]
+            children.append("".join(board))
+        return None, children
+
+    @staticmethod
+    def run_subproblem(line, limit, max_nodes, heuristic, search):
+        """
+        Worker side: searches one subproblem until it is done, cancelled or out of nodes
+        @param limit: number of solutions after which the search of the subproblem stops
+        @return: Tuple of the outcome ("done", "split" or "cancelled"), the solutions found when done or the child
+        subproblems when split, and the number of search nodes spent
+        """
+        event = SplitSearch.cancel_event
+        if event is not None and event.is_set():
+            return "cancelled", [], 0
+        game = Game.from_string(line, quiet=True)
+        budget = Budget(max_nodes=max_nodes, cancel=event)
+        game.solve(heuristic, True, search, limit=limit, budget=budget)
+        nodes = game.backtrack_iterations
+        if budget.reason == "cancelled":
+            return "cancelled", [], nodes
+        if budget.reason is not None and len(game.solutions) < limit:
+            # Solutions found so far are found again in the children, which cover the whole subtree
+            solution, children = SplitSearch.split(line, heuristic)
+            return ("done", [solution], nodes) if solution else ("split", children, nodes)
+        return "done", game.solutions[:limit], nodes
+
+    def initial_subproblems(self, puzzle):
+        """
+        Splits the tree breadth first until there are enough subproblems to keep every worker busy
+        @return: Tuple of the solutions found while splitting and the list of subproblems
+        """
+        solutions = []
+        frontier = deque([Game.from_string(puzzle, quiet=True).sudoku.to_line()])
+        target = self.workers * SplitSearch.SUBPROBLEMS_PER_WORKER
+        subproblems = []
+        while frontier and len(frontier) + len(subproblems) < target:
+            solution, children = SplitSearch.split(frontier.popleft(), self.heuristic)
+            if solution:
+                solutions.append(solution)
+            frontier.extend(children)
+        subproblems.extend(frontier)
+        return solutions, subproblems
+
+    def solve(self, puzzle, limit=1):
+        """
+        Searches a puzzle on all workers
+        @param puzzle: the puzzle in a format Sudoku.from_string reads
+        @param limit: number of solutions after which the search stops, 1 for the first solution, 2 to check that
+        the solution is unique
+        @return: Dict with the solutions found as single lines, their count, whether the count is exact because
+        the search finished below the limit, the search nodes of all workers, the number of subproblems that were
+        solved and split, and the time
+        """
+        start_time = time.perf_counter()
+        solutions, subproblems = self.initial_subproblems(puzzle)
+        result = {"subproblems": len(subproblems), "splits": 0, "nodes": 0}
+        if len(solutions) < limit:
+            if self.workers <= 1:
+                self.run_local(subproblems, limit, solutions, result)
+            else:
+                self.run_pool(subproblems, limit, solutions, result)
+        del solutions[limit:]
+        result.update({
+            "solutions": solutions,
+            "count": len(solutions),
+            "exact": len(solutions) < limit,
+            "time": time.perf_counter() - start_time
+        })
+        return result
+
+    def collect(self, outcome, payload, nodes, max_nodes, limit, solutions, result, stack):
+        """
+        Adds the outcome of a subproblem to the result. The children of a split get twice the node budget of
+        their parent and are pushed onto the stack, so the search goes depth first and the budget soon
+        outgrows subtrees that are deep rather than wide.
+        @param max_nodes: node budget the subproblem was searched with
+        @param stack: subproblems waiting to be searched as (line, node budget), the last one is searched next
+        """
+        result["nodes"] += nodes
+        if outcome == "split":
+            result["splits"] += 1
+            result["subproblems"] += len(payload)
+            stack.extend((line, 2 * max_nodes) for line in reversed(payload))
+        elif outcome == "done":
+            solutions.extend(payload[:limit - len(solutions)])
+
+    def run_local(self, subproblems, limit, solutions, result):
+        stack = [(line, self.max_nodes) for line in reversed(subproblems)]
+        while stack and len(solutions) < limit:
+            line, max_nodes = stack.pop()
+            outcome, payload, nodes = SplitSearch.run_subproblem(line, limit - len(solutions), max_nodes,
+                                                                 self.heuristic, self.search)
+            self.collect(outcome, payload, nodes, max_nodes, limit, solutions, result, stack)
+
+    def run_pool(self, subproblems, limit, solutions, result):
+        context = multiprocessing.get_context()
+        event = context.Event()
+        stack = [(line, self.max_nodes) for line in reversed(subproblems)]
+        # Node budget of every subproblem in flight
+        pending = {}
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=context, initializer=SplitSearch.attach,
+                                 initargs=(event,)) as executor:
+            while len(solutions) < limit:
+                # At most two subproblems per worker are in flight, the rest waits on the stack, depth first
+                while stack and len(pending) < 2 * self.workers:
+                    line, max_nodes = stack.pop()
+                    future = executor.submit(SplitSearch.run_subproblem, line, limit, max_nodes, self.heuristic,
+                                             self.search)
+                    pending[future] = max_nodes
+                if not pending:
+                    break
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    max_nodes = pending.pop(future)
+                    self.collect(*future.result(), max_nodes, limit, solutions, result, stack)
+            # Enough solutions, stop the subproblems that are still running
+            event.set()
+            for future in pending:
+                future.cancel()
+            wait(pending)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Search one hard puzzle on several processes")
+    parser.add_argument("input", help="puzzle file, the first puzzle in it is searched")
+    parser.add_argument("--workers", type=int, default=0, help="number of worker processes, 0 uses all cores")
+    parser.add_argument("--count", type=int, metavar="LIMIT", help="count the solutions up to LIMIT")
+    parser.add_argument("--max-nodes", type=int, default=SplitSearch.MAX_NODES,
+                        help="search nodes spent on a subproblem before it is split again")
+    parser.add_argument("--search", default="mac", choices=Game.SEARCH_MODES)
+    args = parser.parse_args()
+
+    puzzle = next(iter(Batch.read_puzzles(args.input)))
+    result = SplitSearch(args.workers, args.max_nodes, search=args.search).solve(puzzle, args.count or 1)
+    for solution in result["solutions"][:1]:
+        print(solution)
+    count = f"{result['count']}" if result["exact"] else f"at least {result['count']}"
+    print(f"Solutions: {count}, {result['subproblems']} subproblems, {result['splits']} splits, "
+          f"{result['nodes']} nodes, {result['time']:.2f} s")
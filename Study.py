@@ -1,84 +1,76 @@
 import time
-import matplotlib.pyplot as plt
 from Game import Game
+from Parallel import Parallel
 from Sudoku import Sudoku  # Assuming Sudoku and Game classes are defined
 
 
 class ComplexityStudy:
     def __init__(self, sudoku_files):
         self.sudoku_files = sudoku_files  # List of Sudoku file paths
-        self.heuristics = ["default", "MRV", "Degree", "ConstraintPropagation"]
+        self.heuristics = list(Game.HEURISTICS)
         self.results = []
 
-    def run_study(self):
-        """Runs the complexity study on different Sudoku puzzles with different heuristics."""
+    def run_study(self, workers=1, chunksize=1):
+        """
+        Runs the complexity study on different Sudoku puzzles with different heuristics.
+        @param workers: number of worker processes to spread the runs over
+        @param chunksize: number of runs sent to a worker at once
+        """
+        jobs = []
         for sudoku_file in self.sudoku_files:
+            # Workers receive the puzzle as a line of 81 characters instead of a pickled board
+            grid = Sudoku(sudoku_file).to_line()
             for heuristic in self.heuristics:
                 for backtracking in [False, True]:
-
                     print(f"Testing {sudoku_file} with {heuristic} heuristic...")
-                    solved, time_taken, iterations = self.run_solver(sudoku_file, heuristic)
-
-                    self.results.append({
-                        "puzzle": sudoku_file,
-                        "heuristic": heuristic,
-                        "solved": solved,
-                        "time": time_taken,
-                        "iterations": iterations
-                    })
-
-            self.print_summary()
-            self.plot_results()
-
-    def run_solver(self, sudoku_file, heuristic):
+                    for ordering in Game.study_orderings(heuristic, backtracking):
+                        jobs.append((sudoku_file, grid, heuristic, backtracking, ordering))
+
+        self.results.extend(Parallel.ordered_map(ComplexityStudy.run_job, jobs, workers, chunksize))
+
+        self.print_summary()
+        self.plot_results()
+
+    @staticmethod
+    def run_job(job):
+        """
+        Runs one configuration of the study
+        @param job: Tuple of (sudoku file, puzzle line, heuristic, backtracking, value ordering)
+        @return: Result row of the study
+        """
+        sudoku_file, grid, heuristic, backtracking, ordering = job
+        solved, time_taken, iterations = ComplexityStudy.run_solver(grid, heuristic, backtracking, ordering)
+        return {
+            "puzzle": sudoku_file,
+            "heuristic": heuristic,
+            "backtracking": backtracking,
+            "ordering": ordering,
+            "solved": solved,
+            "time": time_taken,
+            "iterations": iterations
+        }
+
+    @staticmethod
+    def run_solver(grid, heuristic, use_backtracking=True, ordering="none"):
         """Runs the Sudoku solver and records performance metrics."""
-        sudoku = Sudoku(sudoku_file)
-        game = Game(sudoku)
-
-        start_time = time.time()
-        iterations = 0  # Track number of iterations
-
-        # Modify solve function to count iterations
-        def track_iterations():
-            nonlocal iterations
-            iterations += 1
+        game = Game(Sudoku.from_string(grid), quiet=True)
 
-        # Attach tracking to backtracking function
-        original_backtrack = game.backtrack
-        def modified_backtrack(assignment):
-            track_iterations()
-            return original_backtrack(assignment)
+        start_time = time.perf_counter()
+        solved = bool(game.solve(heuristic, use_backtracking, ordering=ordering))
+        time_taken = time.perf_counter() - start_time
 
-        game.backtrack = modified_backtrack
-
-        # Solve the Sudoku
-        solved = game.solve(heuristic, use_backtracking=True)
-        time_taken = time.time() - start_time
-
-        return solved, time_taken, iterations
+        return solved, time_taken, game.backtrack_iterations
 
     def print_summary(self):
         """Prints a summary of the results."""
         print("\n=== Complexity Study Summary ===")
         for result in self.results:
-            print(f"Puzzle: {result['puzzle']} | Heuristic: {result['heuristic']} | "
+            print(f"Puzzle: {result['puzzle']} | Heuristic: {result['heuristic']} | Ordering: {result['ordering']} | "
                   f"Solved: {result['solved']} | Time: {result['time']:.4f}s | Iterations: {result['iterations']}")
 
     def plot_results(self):
         """Plots a graph comparing heuristic performance."""
-        difficulties = list(set(result["puzzle"] for result in self.results))
-        heuristics = self.heuristics
-
-        plt.figure(figsize=(10, 5))
-
-        for heuristic in heuristics:
-            times = [result["time"] for result in self.results if result["heuristic"] == heuristic]
-            plt.plot(difficulties, times, label=heuristic, marker='o')
-
-        plt.xlabel("Sudoku Puzzle")
-        plt.ylabel("Time (seconds)")
-        plt.title("Sudoku Solving Time Comparison")
-        plt.legend()
-        plt.xticks(rotation=45)
-        plt.grid()
-        plt.show()
+        # Imported here so that running the study without plots never loads matplotlib
+        from Report import Report
+        # The plot compares heuristics, so every heuristic contributes its runs with the default value ordering
+        Report.plot_results([result for result in self.results if result["ordering"] == "none"], self.heuristics)
@@ -1,25 +1,68 @@
+from math import isqrt
+from Domain import SYMBOLS
 from Field import Field
+from Topology import Topology
 
 
 class Sudoku:
 
-    def __init__(self, filename):
-        self.board = self.read_sudoku(filename)
+    def __init__(self, filename=None, rows=None):
+        self.board = self.read_sudoku(filename) if rows is None else self.parse_grid(rows)
+        # Peer, row, column and box tables shared by all boards of this size
+        self.topology = Topology.for_box_size(isqrt(len(self.board)))
+        # Values and domain bitmasks of all fields in row-major order
+        self.values = [0] * self.topology.cell_count
+        self.domains = [0] * self.topology.cell_count
+        self.fields = [field for row in self.board for field in row]
+        for index, field in enumerate(self.fields):
+            field.bind(self, index)
+
+    @staticmethod
+    def from_string(text):
+        """
+        Build a sudoku from text instead of a file
+        @param text: Either the whole board on a single line, e.g. 81 characters for a 9x9 board, or
+        the rows of the board on separate lines in any of the formats read_sudoku accepts
+        @return: A Sudoku instance
+        """
+        return Sudoku(rows=Sudoku.split_rows(text))
+
+    @staticmethod
+    def split_rows(text):
+        """
+        Split the text of a board into rows of tokens. Rows are either written as one character per field,
+        using 0 or . for empty fields and letters for values above 9 (A = 10, B = 11, ...), or as numbers
+        separated by whitespace, which allows values of more than one digit.
+        A board given as a single line is cut into rows, its length has to be size * size.
+        @param text: text of the board
+        @return: List of rows, each a string of characters or a list of number tokens
+        """
+        lines = [line.strip() for line in text.strip().splitlines() if line.strip()]
+        if len(lines) == 1 and " " not in lines[0]:
+            line = lines[0]
+            size = isqrt(len(line))
+            return [line[i:i + size] for i in range(0, len(line), size)]
+        if any(len(line.split()) > 1 for line in lines):
+            return [line.split() for line in lines]
+        return lines
 
     def __str__(self):
-        output = "╔═══════╦═══════╦═══════╗\n"
+        size = self.topology.size
+        box_size = self.topology.box_size
+        segment = "═" * (2 * box_size + 1)
+        output = "╔" + "╦".join([segment] * box_size) + "╗\n"
         # iterate through rows
-        for i in range(9):
-            if i == 3 or i == 6:
-                output += "╠═══════╬═══════╬═══════╣\n"
+        for i in range(size):
+            if i != 0 and i % box_size == 0:
+                output += "╠" + "╬".join([segment] * box_size) + "╣\n"
             output += "║ "
             # iterate through columns
-            for j in range(9):
-                if j == 3 or j == 6:
+            for j in range(size):
+                if j != 0 and j % box_size == 0:
                     output += "║ "
                 output += str(self.board[i][j]) + " "
             output += "║\n"
-        output += "╚═══════╩═══════╩═══════╝\n"
+        output += "╚" + "╩".join([segment] * box_size) + "╝\n"
         return output
 
     @staticmethod
@@ -27,83 +70,87 @@ class Sudoku:
         """
         Read in a sudoku file
         @param filename: Sudoku filename
-        @return: A 9x9 grid of Fields where each field is initialized with all its neighbor fields
+        @return: A size x size grid of Fields
         """
         assert filename is not None and filename != "", "Invalid filename"
-        # Setup 9x9 grid
-        grid = [[Field for _ in range(9)] for _ in range(9)]
 
         try:
             with open(filename, "r") as file:
-                for row, line in enumerate(file):
-                    for col_index, char in enumerate(line):
-                        if char == '\n':
-                            continue
-                        if int(char) == 0:
-                            grid[row][col_index] = Field()
-                        else:
-                            grid[row][col_index] = Field(int(char))
-
+                rows = Sudoku.split_rows(file.read())
         except FileNotFoundError:
             print("Error opening file: " + filename)
+            raise
 
-        Sudoku.add_neighbours(grid)
-        return grid
-
-
-
-
+        return Sudoku.parse_grid(rows)
 
     @staticmethod
-    def add_neighbours(grid):
+    def parse_token(token):
         """
-        Adds a list of neighbors to each field
-        @param grid: 9x9 list of Fields
+        Value of a single field, 0 for an empty field
+        @param token: a character (0-9, A-Z or .) or a decimal number
         """
-        for i in range(9):
-            for j in range(9):
-                #Create neighbour list
-                neighbours = set()
-
-                #Add row neighbours
-                for k in range(9):
-                    if k != j:
-                        field = grid[i][k]
-                        neighbours.add(field)
-
-
-                #Add column neighbours
-                for k in range(9):
-                    if k != i:
-                        field = grid[k][j]
-                        neighbours.add(field)
-
-
-                #Add 3x3 box neighbours
-                box_row_start = (i//3)*3
-                box_col_start = (j//3)*3
-                for box_row in range(box_row_start, box_row_start + 3):
-                    for box_col in range(box_col_start, box_col_start + 3):
-                        if (box_row, box_col) != (i, j):  # Exclude the current field itself
-                            field = grid[box_row][box_col]
-                            neighbours.add(field)
-
-                grid[i][j].set_neighbours(list(neighbours))
-
-
+        if token == '.':
+            return 0
+        if len(token) == 1:
+            return int(token, 36)
+        return int(token)
 
+    @staticmethod
+    def parse_grid(rows):
+        """
+        Build the grid from rows of tokens, where 0 or . marks an empty field
+        @param rows: size rows of size tokens each, where size is the square of the box size (9, 16, 25, ...)
+        @return: A size x size grid of Fields
+        """
+        size = len(rows)
+        box_size = isqrt(size)
+        assert size > 0 and box_size * box_size == size, "The number of rows has to be a square, e.g. 9, 16 or 25"
+        assert size < len(SYMBOLS), f"A board has at most {len(SYMBOLS) - 1} values, the largest is 25x25"
+        assert all(len(row) == size for row in rows), f"A sudoku needs {size} rows of {size} fields"
+        # Setup size x size grid
+        grid = [[Field for _ in range(size)] for _ in range(size)]
+
+        for row, line in enumerate(rows):
+            for col_index, token in enumerate(line):
+                value = Sudoku.parse_token(token)
+                assert 0 <= value <= size, f"Invalid value {token} in row {row + 1}"
+                if value == 0:
+                    grid[row][col_index] = Field(size=size)
+                else:
+                    grid[row][col_index] = Field(value, size=size)
 
+        return grid
 
     def board_to_string(self):
 
         output = ""
         for row in range(len(self.board)):
             for col in range(len(self.board[row])):
-                output += self.board[row][col].get_value()
+                output += SYMBOLS[self.board[row][col].get_value()]
             output += "\n"
         return output
 
+    def to_line(self):
+        """
+        Single line representation of the board, with . for fields that have no value and letters for values above 9
+        @return: String of size * size characters in row-major order, 81 for a 9x9 board
+        """
+        return "".join(SYMBOLS[value] if value else "." for value in self.values)
+
     def get_board(self):
         return self.board
 
+    def get_values(self):
+        return self.values
+
+    def get_domains(self):
+        return self.domains
 
+    def get_fields(self, indices):
+        """
+        Look up fields by their row-major index
+        @param indices: iterable of field indices, e.g. a row of the peer table
+        @return: List of Fields
+        """
+        fields = self.fields
+        return [fields[index] for index in indices]
@@ -0,0 +1,74 @@
+class Topology:
+    """
+    Static index tables describing which fields constrain each other. Fields are numbered in
+    row-major order, so the field in row r and column c has index r * size + c. The tables only
+    depend on the board size, so one instance is shared by every board of that size.
+    """
+
+    _cache = {}
+
+    def __init__(self, box_size=3):
+        self.box_size = box_size
+        self.size = box_size * box_size
+        self.cell_count = self.size * self.size
+        size = self.size
+
+        self.rows = tuple(tuple(row * size + col for col in range(size)) for row in range(size))
+        self.columns = tuple(tuple(row * size + col for row in range(size)) for col in range(size))
+        self.boxes = tuple(
+            tuple((box_row + i) * size + box_col + j for i in range(box_size) for j in range(box_size))
+            for box_row in range(0, size, box_size)
+            for box_col in range(0, size, box_size)
+        )
+        # All units in one tuple: rows first, then columns, then boxes
+        self.units = self.rows + self.columns + self.boxes
+
+        # For every field the indices of its row, column and box in self.units
+        self.cell_units = tuple(
+            (cell // size, size + cell % size,
+             2 * size + (cell // size // box_size) * box_size + cell % size // box_size)
+            for cell in range(self.cell_count)
+        )
+
+        # For every field the sorted indices of all other fields sharing a unit with it
+        self.peers = tuple(
+            tuple(sorted(set().union(*(self.units[unit] for unit in self.cell_units[cell])) - {cell}))
+            for cell in range(self.cell_count)
+        )
+
+        # Intersections of boxes with rows and columns, used by the pointing and box-line rules.
+        # For every box its (row unit, cells) and (column unit, cells) segments, and for every row and
+        # column (indexed like self.units) its (box unit, cells) segments.
+        self.box_rows = []
+        self.box_columns = []
+        self.line_boxes = [[] for _ in range(2 * size)]
+        for box_number, box in enumerate(self.boxes):
+            box_unit = 2 * size + box_number
+            rows = {}
+            columns = {}
+            for cell in box:
+                rows.setdefault(cell // size, []).append(cell)
+                columns.setdefault(size + cell % size, []).append(cell)
+            self.box_rows.append(tuple((line, tuple(cells)) for line, cells in rows.items()))
+            self.box_columns.append(tuple((line, tuple(cells)) for line, cells in columns.items()))
+            for line, cells in list(rows.items()) + list(columns.items()):
+                self.line_boxes[line].append((box_unit, tuple(cells)))
+        self.box_rows = tuple(self.box_rows)
+        self.box_columns = tuple(self.box_columns)
+        self.line_boxes = tuple(tuple(segments) for segments in self.line_boxes)
+
+    @staticmethod
+    def for_box_size(box_size):
+        """
+        Shared topology for boards made of box_size x box_size boxes
+        @param box_size: 3 for a standard 9x9 sudoku
+        @return: The Topology instance for this size
+        """
+        topology = Topology._cache.get(box_size)
+        if topology is None:
+            topology = Topology._cache[box_size] = Topology(box_size)
+        return topology
+
+
+# The standard 9x9 tables are built once at import
+STANDARD = Topology.for_box_size(3)
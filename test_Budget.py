@@ -0,0 +1,28 @@
+import os
+from Budget import Budget
+from Game import Game
+from Sudoku import Sudoku
+
+sudoku_file = os.path.join(os.path.dirname(__file__), "Sudokus", "Sudoku3.txt")
+
+
+def solve(heuristic, search, max_nodes=None):
+    game = Game(Sudoku(sudoku_file), quiet=True)
+    budget = Budget(max_nodes=max_nodes) if max_nodes is not None else None
+    return game.solve(heuristic, True, search, budget=budget), game.backtrack_iterations
+
+
+def check_node_boundary(heuristic, search):
+    """A budget of exactly the nodes the solve needs solves the puzzle, one node less does not"""
+    stats, nodes = solve(heuristic, search)
+    assert stats.status == "solved"
+    assert solve(heuristic, search, nodes)[0].status == "solved"
+    assert solve(heuristic, search, nodes - 1)[0].status == "budget_exceeded"
+
+
+def test_max_nodes_boundary_mac():
+    check_node_boundary("MRV", "mac")
+
+
+def test_max_nodes_boundary_dlx():
+    check_node_boundary("DLX", "plain")